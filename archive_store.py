@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+去重归档存储模块
+
+@Description: 将项目导出的 .tar.gz 解包，按成员文件切分为块并以 SHA-256 为名保存（相同内容只存一份），
+              每次备份生成一个快照清单；可从快照还原出可导入 GitLab 的 .tar.gz，并按保留数量清理旧快照
+"""
+
+import io
+import os
+import json
+import zlib
+import tarfile
+import hashlib
+import threading
+from datetime import datetime
+from config import STORE_PATH, STORE_KEEP_SNAPSHOTS
+
+# 块大小：成员文件按固定偏移切分，未变化的文件和只在末尾追加的文件都能完全去重
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# 有快照被删除、尚未清理块时存在的标记文件
+GC_PENDING = '.gc_pending'
+
+# 入库和清理互斥，避免清理时删除正在被新快照引用的块
+_lock = threading.Lock()
+
+
+def _chunk_path(store_path, digest):
+    return os.path.join(store_path, 'chunks', digest[:2], digest)
+
+
+def _snapshot_dir(store_path, project_id):
+    return os.path.join(store_path, 'snapshots', str(project_id))
+
+
+def _put_chunk(store_path, data):
+    """保存一个块，已存在时跳过；返回 (SHA-256, 新写入的字节数)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _chunk_path(store_path, digest)
+    if os.path.exists(path):
+        return digest, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    compressed = zlib.compress(data, 6)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(compressed)
+    os.replace(tmp_path, path)
+    return digest, len(compressed)
+
+
+def _get_chunk(store_path, digest):
+    with open(_chunk_path(store_path, digest), 'rb') as f:
+        return zlib.decompress(f.read())
+
+
+def store_archive(project_id, project_info, archive_path, store_path=STORE_PATH):
+    """将导出归档存入去重存储，返回快照清单"""
+    snapshot = {
+        'project_id': project_id,
+        'name': project_info.get('name'),
+        'last_activity_at': project_info.get('last_activity_at'),
+        'id': datetime.now().strftime('%Y%m%dT%H%M%S'),
+        'created_at': datetime.now().isoformat(),
+        'source_archive': os.path.basename(archive_path),
+        'members': [],
+        'size': 0,
+        'stored_bytes': 0
+    }
+
+    with _lock, tarfile.open(archive_path, 'r|gz') as tar:
+        for member in tar:
+            entry = {
+                'name': member.name,
+                'type': member.type.decode('ascii'),
+                'mode': member.mode,
+                'mtime': member.mtime,
+                'size': member.size,
+                'linkname': member.linkname
+            }
+            if member.isfile():
+                entry['chunks'] = []
+                source = tar.extractfile(member)
+                for data in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    digest, written = _put_chunk(store_path, data)
+                    entry['chunks'].append(digest)
+                    snapshot['stored_bytes'] += written
+                snapshot['size'] += member.size
+            snapshot['members'].append(entry)
+
+        snapshot_dir = _snapshot_dir(store_path, project_id)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        base_id, suffix = snapshot['id'], 1
+        while os.path.exists(os.path.join(snapshot_dir, f"{snapshot['id']}.json")):
+            snapshot['id'] = f"{base_id}-{suffix}"
+            suffix += 1
+        path = os.path.join(snapshot_dir, f"{snapshot['id']}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    print(f"已存入去重存储：快照 {snapshot['id']}，内容 {snapshot['size'] / 1024 / 1024:.1f} MB，"
+          f"新增 {snapshot['stored_bytes'] / 1024 / 1024:.1f} MB")
+    return snapshot
+
+
+def list_snapshots(project_id, store_path=STORE_PATH):
+    """列出项目的快照ID，按时间从旧到新"""
+    snapshot_dir = _snapshot_dir(store_path, project_id)
+    if not os.path.isdir(snapshot_dir):
+        return []
+    return sorted(name[:-5] for name in os.listdir(snapshot_dir) if name.endswith('.json'))
+
+
+def load_snapshot(project_id, snapshot_id, store_path=STORE_PATH):
+    path = os.path.join(_snapshot_dir(store_path, project_id), f"{snapshot_id}.json")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class _ChunkReader(io.RawIOBase):
+    """按顺序读取一个成员文件的所有块"""
+
+    def __init__(self, store_path, digests):
+        self._store_path = store_path
+        self._digests = iter(digests)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            digest = next(self._digests, None)
+            if digest is None:
+                return 0
+            self._buffer = _get_chunk(self._store_path, digest)
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def restore_snapshot(project_id, snapshot_id, output_file, store_path=STORE_PATH):
+    """从快照还原导出归档（.tar.gz），可直接导入 GitLab"""
+    snapshot = load_snapshot(project_id, snapshot_id, store_path)
+    with tarfile.open(output_file, 'w:gz') as tar:
+        for entry in snapshot['members']:
+            info = tarfile.TarInfo(entry['name'])
+            info.type = entry['type'].encode('ascii')
+            info.mode = entry['mode']
+            info.mtime = entry['mtime']
+            info.linkname = entry['linkname']
+            if 'chunks' in entry:
+                info.size = entry['size']
+                tar.addfile(info, io.BufferedReader(_ChunkReader(store_path, entry['chunks'])))
+            else:
+                tar.addfile(info)
+    return output_file
+
+
+def prune_snapshots(project_id, keep=STORE_KEEP_SNAPSHOTS, store_path=STORE_PATH):
+    """只保留项目最近的 keep 个快照，返回删除的快照数
+
+    只删除快照清单；不再被引用的块由 collect_garbage 在整批导出结束后统一清理。
+    """
+    with _lock:
+        snapshot_ids = list_snapshots(project_id, store_path)
+        expired = snapshot_ids[:-keep] if keep > 0 else []
+        for snapshot_id in expired:
+            os.remove(os.path.join(_snapshot_dir(store_path, project_id), f"{snapshot_id}.json"))
+        if expired:
+            # 标记需要清理，中断后下一次运行仍会清理
+            with open(os.path.join(store_path, GC_PENDING), 'w', encoding='utf-8') as f:
+                f.write(datetime.now().isoformat())
+    return len(expired)
+
+
+def collect_garbage(store_path=STORE_PATH, force=False):
+    """删除不再被任何快照引用的块，返回释放的字节数
+
+    一次标记-清除需要读取所有快照清单，只在有快照被删除后（或 force 为 True 时）执行，
+    应在一批导出全部结束后调用一次。
+    """
+    marker = os.path.join(store_path, GC_PENDING)
+    with _lock:
+        if not force and not os.path.exists(marker):
+            return 0
+        if os.path.exists(marker):
+            os.remove(marker)
+        freed = _collect_garbage(store_path)
+    if freed:
+        print(f"已清理不再引用的块 {freed / 1024 / 1024:.1f} MB")
+    return freed
+
+
+def _collect_garbage(store_path):
+    """标记所有快照引用的块，删除其余的块"""
+    referenced = set()
+    snapshots_root = os.path.join(store_path, 'snapshots')
+    chunks_root = os.path.join(store_path, 'chunks')
+    if not os.path.isdir(snapshots_root) or not os.path.isdir(chunks_root):
+        return 0
+    for project_dir in os.listdir(snapshots_root):
+        for name in os.listdir(os.path.join(snapshots_root, project_dir)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(snapshots_root, project_dir, name), 'r', encoding='utf-8') as f:
+                for entry in json.load(f)['members']:
+                    referenced.update(entry.get('chunks', ()))
+
+    freed = 0
+    for prefix in os.listdir(chunks_root):
+        for digest in os.listdir(os.path.join(chunks_root, prefix)):
+            if digest not in referenced:
+                path = os.path.join(chunks_root, prefix, digest)
+                freed += os.path.getsize(path)
+                os.remove(path)
+    return freed
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+归档完整性校验模块
+
+@Description: 在写入下载数据的同时计算 SHA-256 并检查 gzip（CRC）和 tar 结构，无需二次读取；
+              校验和写入 sha256sum 格式的旁路文件，并支持多进程并行校验整个备份目录
+"""
+
+import os
+import re
+import glob
+import zlib
+import tarfile
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+# 每次解压的最大输出，避免高压缩比的数据占用过多内存
+INFLATE_LIMIT = 16 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+SIDECAR_SUFFIX = '.sha256'
+
+_PAX_SIZE = re.compile(rb'\d+ size=(\d+)\n')
+
+
+class IntegrityError(Exception):
+    """归档不完整或已损坏"""
+
+
+class StreamVerifier:
+    """按顺序接收归档数据，边接收边校验
+
+    update() 依次传入文件内容；全部传入后调用 result() 获取校验结果。
+    gzip 流的 CRC 和长度由 zlib 在流结束时校验，tar 头部逐个解析并校验头部校验和。
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.members = 0
+        self._sha256 = hashlib.sha256()
+        self._inflate = zlib.decompressobj(31)
+        self._buffer = bytearray()
+        self._skip = 0
+        self._pax = None        # 正在读取的 pax 扩展头数据
+        self._pax_size = None   # pax 扩展头中给出的下一个成员的大小
+        self._tar_end = False
+        self.error = None
+
+    def update(self, chunk):
+        self._sha256.update(chunk)
+        self.size += len(chunk)
+        if self.error:
+            return
+        try:
+            data = chunk
+            while data:
+                if self._inflate.eof:
+                    # 多成员 gzip：上一个成员已结束，剩余数据属于下一个成员
+                    self._inflate = zlib.decompressobj(31)
+                self._feed_tar(self._inflate.decompress(data, INFLATE_LIMIT))
+                data = self._inflate.unused_data if self._inflate.eof else self._inflate.unconsumed_tail
+        except (zlib.error, tarfile.TarError) as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+    def _feed_tar(self, data):
+        if self._tar_end:
+            return
+        buffer = self._buffer
+        buffer += data
+        while True:
+            if self._skip:
+                size = min(self._skip, len(buffer))
+                if self._pax is not None:
+                    self._pax += buffer[:size]
+                del buffer[:size]
+                self._skip -= size
+                if self._skip:
+                    return
+                if self._pax is not None:
+                    match = _PAX_SIZE.search(self._pax)
+                    self._pax_size = int(match.group(1)) if match else None
+                    self._pax = None
+                continue
+
+            if len(buffer) < tarfile.BLOCKSIZE:
+                return
+            block = bytes(buffer[:tarfile.BLOCKSIZE])
+            del buffer[:tarfile.BLOCKSIZE]
+            try:
+                info = tarfile.TarInfo.frombuf(block, 'utf-8', 'surrogateescape')
+            except tarfile.EOFHeaderError:
+                # 全零块：归档结束
+                self._tar_end = True
+                buffer.clear()
+                return
+
+            if info.type in (tarfile.XHDTYPE, tarfile.SOLARIS_XHDTYPE):
+                self._pax = bytearray()
+                size = info.size
+            elif info.type in (tarfile.XGLTYPE, tarfile.GNUTYPE_LONGNAME, tarfile.GNUTYPE_LONGLINK):
+                size = info.size
+            else:
+                self.members += 1
+                if self._pax_size is not None:
+                    info.size = self._pax_size
+                    self._pax_size = None
+                # 与 tarfile 相同：只有普通文件和未知类型的成员带有数据块
+                size = info.size if info.isreg() or info.type not in tarfile.SUPPORTED_TYPES else 0
+            self._skip = -(-size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            if not self._skip:
+                self._pax = None
+
+    def result(self):
+        """返回校验结果 {sha256, size, members, ok, error}"""
+        error = self.error
+        if not error and not self._inflate.eof:
+            error = "gzip 数据不完整（文件被截断）"
+        if not error and not self._tar_end:
+            error = "tar 结构不完整（缺少结束块）"
+        return {
+            "sha256": self._sha256.hexdigest(),
+            "size": self.size,
+            "members": self.members,
+            "ok": error is None,
+            "error": error
+        }
+
+
+def feed_file(verifier, filepath, start=0, end=None):
+    """将文件中 [start, end) 范围的内容传入校验器"""
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = None if end is None else end - start
+        while remaining is None or remaining > 0:
+            data = f.read(READ_SIZE if remaining is None else min(READ_SIZE, remaining))
+            if not data:
+                break
+            verifier.update(data)
+            if remaining is not None:
+                remaining -= len(data)
+
+
+def sidecar_path(filepath):
+    return f"{filepath}{SIDECAR_SUFFIX}"
+
+
+def write_sidecar(filepath, sha256):
+    """写入 sha256sum 格式的校验和文件，可用 sha256sum -c 校验"""
+    with open(sidecar_path(filepath), 'w', encoding='utf-8') as f:
+        f.write(f"{sha256}  {os.path.basename(filepath)}\n")
+
+
+def read_sidecar(filepath):
+    """读取校验和文件中的 SHA-256，不存在时返回 None"""
+    try:
+        with open(sidecar_path(filepath), 'r', encoding='utf-8') as f:
+            return f.read().split()[0]
+    except (OSError, IndexError):
+        return None
+
+
+def verify_file(filepath):
+    """校验单个归档的结构，并与校验和文件比对"""
+    verifier = StreamVerifier()
+    try:
+        feed_file(verifier, filepath)
+    except OSError as e:
+        return {"file": filepath, "ok": False, "error": str(e)}
+    result = verifier.result()
+    result["file"] = filepath
+    expected = read_sidecar(filepath)
+    result["sidecar"] = expected is not None
+    if result["ok"] and expected and expected != result["sha256"]:
+        result["ok"] = False
+        result["error"] = "SHA-256 与校验和文件不一致"
+    return result
+
+
+def verify_directory(directory, workers=None):
+    """多进程并行校验目录中的所有 .tar.gz，返回结果列表"""
+    files = sorted(glob.glob(os.path.join(directory, '*.tar.gz')))
+    if not files:
+        return []
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        return list(pool.map(verify_file, files))
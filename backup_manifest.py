@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+备份清单模块
+
+@Description: 在输出目录中记录每个项目最近一次成功备份时的 last_activity_at、
+              归档文件校验和与导出时间，用于增量备份时只导出有变化的项目
+"""
+
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from config import OUTPUT_DIR
+
+MANIFEST_FILE = 'backup_manifest.json'
+
+_lock = threading.Lock()
+
+
+def manifest_path(output_dir=OUTPUT_DIR):
+    return os.path.join(output_dir, MANIFEST_FILE)
+
+
+def load_manifest(output_dir=OUTPUT_DIR):
+    """加载备份清单，不存在或损坏时返回空清单"""
+    try:
+        with open(manifest_path(output_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest.setdefault('projects', {})
+        return manifest
+    except (OSError, ValueError):
+        return {'projects': {}}
+
+
+def save_manifest(manifest, output_dir=OUTPUT_DIR):
+    """原子地写入备份清单"""
+    path = manifest_path(output_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def file_sha256(filepath, chunk_size=1024 * 1024):
+    """计算文件的 SHA-256"""
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def record_backup(project_id, project_info, filepath, output_dir=OUTPUT_DIR, snapshot=None, sha256=None):
+    """记录一次成功的备份（下载完成后调用，可在多个下载线程中并发调用）
+
+    snapshot 为去重存储中对应的快照ID（未启用去重存储时为 None）；
+    sha256 为下载时已计算的校验和，未传入时读取文件计算。
+    """
+    entry = {
+        'name': project_info.get('name'),
+        'last_activity_at': project_info.get('last_activity_at'),
+        'archive': os.path.basename(filepath),
+        'sha256': sha256 or file_sha256(filepath),
+        'size': os.path.getsize(filepath),
+        'exported_at': datetime.now().isoformat(),
+        'snapshot': snapshot
+    }
+    with _lock:
+        manifest = load_manifest(output_dir)
+        manifest['projects'][str(project_id)] = entry
+        manifest['updated_at'] = entry['exported_at']
+        save_manifest(manifest, output_dir)
+    return entry
+
+
+def needs_backup(project, manifest, output_dir=OUTPUT_DIR):
+    """判断项目自上次成功备份以来是否有变化（或备份文件和快照都不存在）"""
+    entry = manifest['projects'].get(str(project['id']))
+    if not entry:
+        return True
+    if entry.get('last_activity_at') != project.get('last_activity_at'):
+        return True
+    return not (entry.get('snapshot') or os.path.exists(os.path.join(output_dir, entry['archive'])))
+
+
+def select_changed_projects(projects, output_dir=OUTPUT_DIR):
+    """从项目列表中筛选需要重新备份的项目"""
+    manifest = load_manifest(output_dir)
+    return [project for project in projects if needs_backup(project, manifest, output_dir)]
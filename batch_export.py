@@ -0,0 +1,133 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from gitlab_api import (start_export, check_export_status, download_export, get_repository_size,
+                        has_partial_download)
+from export_watcher import ExportWatcher
+from file_operations import ensure_output_dir, get_project_info
+from backup_manifest import select_changed_projects
+from archive_store import collect_garbage
+from config import (OUTPUT_DIR, MAX_CONCURRENT_EXPORTS, DOWNLOAD_WORKERS,
+                    POLL_INTERVAL, MAX_POLL_INTERVAL, STORE_ENABLED)
+
+
+def _download_worker(project_id, project_info, output_dir):
+    """下载线程：并发请求数由客户端的自适应限流器控制"""
+    return download_export(project_id, project_info, output_dir, show_progress=False)
+
+
+def export_projects_batch(project_ids, output_dir=OUTPUT_DIR,
+                          max_concurrent=MAX_CONCURRENT_EXPORTS,
+                          download_workers=DOWNLOAD_WORKERS,
+                          poll_interval=POLL_INTERVAL,
+                          max_poll_interval=MAX_POLL_INTERVAL,
+                          reuse_finished=False):
+    """批量导出多个项目
+
+    同时触发最多 max_concurrent 个导出，由 ExportWatcher 按仓库大小安排每个导出的轮询时间，
+    每轮只检查到期的导出；已完成的导出交给有界的下载线程池下载。返回 {项目ID: 是否成功}。
+    有上次中断的下载、且服务器上的导出仍为完成状态的项目不重新导出，直接从断点继续下载；
+    reuse_finished 为 True 时服务器上已有完成导出的项目都直接下载。
+    """
+    ensure_output_dir()
+
+    pending = deque(project_ids)
+    watcher = ExportWatcher(poll_interval, max_poll_interval)
+    started_at = {}  # project_id -> 导出开始时间
+    project_infos = {}
+    downloads = {}   # future -> project_id
+    results = {}
+
+    print(f"\n开始批量导出 {len(pending)} 个项目"
+          f"（并发导出: {max_concurrent}，下载线程: {download_workers}）")
+
+    with ThreadPoolExecutor(max_workers=download_workers) as pool:
+        while pending or watcher or downloads:
+            # 触发新的导出，直到达到并发上限
+            while pending and len(watcher) < max_concurrent:
+                project_id = pending.popleft()
+                project_info = get_project_info(project_id)
+                if not project_info:
+                    print(f"项目 {project_id} 不在项目列表中，已跳过")
+                    results[project_id] = False
+                    continue
+                partial = has_partial_download(project_id, project_info, output_dir)
+                reuse = (reuse_finished or partial) and check_export_status(project_id) == "finished"
+                if not reuse:
+                    repository_size = get_repository_size(project_id)
+                    started = start_export(project_id)
+                if reuse:
+                    # 重新导出会使服务器上的文件变化，已下载的部分无法续传
+                    print(f"项目 {project_id} 服务器上已有完成的导出，直接下载"
+                          f"{'（从断点继续）' if partial else ''}")
+                    future = pool.submit(_download_worker, project_id, project_info, output_dir)
+                    downloads[future] = project_id
+                    continue
+                if started:
+                    watcher.add(project_id, repository_size)
+                    started_at[project_id] = time.time()
+                    project_infos[project_id] = project_info
+                    print(f"  预计耗时约 {watcher.progress(project_id)[1]:.0f} 秒")
+                else:
+                    results[project_id] = False
+
+            # 只轮询到期的导出
+            for project_id, status in watcher.sweep(check_export_status):
+                if status == "finished":
+                    elapsed = time.time() - started_at.pop(project_id)
+                    print(f"项目 {project_id} 导出完成（耗时 {elapsed:.0f} 秒），开始下载")
+                    future = pool.submit(_download_worker, project_id,
+                                         project_infos.pop(project_id), output_dir)
+                    downloads[future] = project_id
+                elif status in ("failed", "none"):
+                    started_at.pop(project_id)
+                    project_infos.pop(project_id)
+                    print(f"项目 {project_id} 导出失败（状态: {status}）")
+                    results[project_id] = False
+
+            # 收集已完成的下载
+            for future in [f for f in downloads if f.done()]:
+                project_id = downloads.pop(future)
+                try:
+                    results[project_id] = future.result()
+                except Exception as e:
+                    print(f"项目 {project_id} 下载出错: {str(e)}")
+                    results[project_id] = False
+
+            if pending and len(watcher) < max_concurrent:
+                continue
+            if watcher or downloads:
+                wait = watcher.seconds_until_due()
+                if downloads:
+                    # 有下载进行中时需要及时收集结果
+                    wait = 0.5 if wait is None else min(wait, 0.5)
+                time.sleep(wait)
+
+    if STORE_ENABLED:
+        # 整批结束后统一清理旧快照不再引用的块
+        collect_garbage()
+
+    succeeded = sum(1 for ok in results.values() if ok)
+    print(f"\n批量导出完成：成功 {succeeded} 个，失败 {len(results) - succeeded} 个"
+          f"（状态查询 {watcher.polls} 次）")
+    return results
+
+
+def export_changed_projects(output_dir=OUTPUT_DIR):
+    """增量备份：同步项目目录，只导出自上次成功备份以来有活动的项目
+
+    项目是否变化根据备份清单中记录的 last_activity_at 判断，备份文件丢失的项目也会重新导出。
+    返回 {项目ID: 是否成功}，获取项目列表失败时返回 None。
+    """
+    from gitlab_api import get_projects
+
+    print("\n正在同步项目列表...")
+    projects, success = get_projects(save_automatically=True)
+    if not success:
+        return None
+
+    changed = select_changed_projects(projects, output_dir)
+    print(f"共 {len(projects)} 个项目，其中 {len(changed)} 个自上次备份以来有变化")
+    if not changed:
+        return {}
+    return export_projects_batch([project['id'] for project in changed], output_dir)
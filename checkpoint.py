@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+导出检查点模块
+
+@Description: 以 JSON Lines 日志记录导出进度（已获取的提交列表和提交详情），
+              中断后可从检查点继续，已获取的数据直接从日志回放，不再请求网络
+"""
+
+import os
+import json
+import glob
+import hashlib
+from datetime import datetime
+
+CHECKPOINT_DIR = os.path.join('.cache', 'checkpoints')
+
+
+def checkpoint_key(kind, user_id, since, until, formats):
+    """根据导出参数生成检查点标识（与输出文件名中的时间戳无关）"""
+    raw = json.dumps([kind, user_id, since, until, sorted(formats)])
+    return f"{kind}_{user_id}_{hashlib.sha1(raw.encode()).hexdigest()[:10]}"
+
+
+def checkpoint_path(key):
+    return os.path.join(CHECKPOINT_DIR, f"{key}.jsonl")
+
+
+def read_meta(path):
+    """读取检查点日志的第一行（导出参数）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            record = json.loads(f.readline())
+        return record if record.get('type') == 'meta' else None
+    except (OSError, ValueError):
+        return None
+
+
+def list_checkpoints():
+    """列出所有未完成的导出检查点，最近的在前"""
+    paths = sorted(glob.glob(os.path.join(CHECKPOINT_DIR, '*.jsonl')),
+                   key=os.path.getmtime, reverse=True)
+    return [meta for meta in (read_meta(path) for path in paths) if meta]
+
+
+def has_checkpoint(kind, user_id, since, until, formats):
+    return os.path.exists(checkpoint_path(checkpoint_key(kind, user_id, since, until, formats)))
+
+
+class ExportCheckpoint:
+    """导出检查点日志
+
+    日志记录类型：
+      meta        导出参数（含输出文件路径），用于 --resume
+      commit_list 某个项目的提交列表（所有分页）已获取完成
+      commit      单个提交的详情（含文件变更）
+      project     某个项目已全部处理
+    内存中只保留提交在日志中的偏移量，回放时按需读取。
+    """
+
+    def __init__(self, kind, user_id, since, until, outputs, resume=False):
+        self.key = checkpoint_key(kind, user_id, since, until, outputs)
+        self.path = checkpoint_path(self.key)
+        self.commit_lists = {}
+        self.commit_offsets = {}
+        self.projects_done = set()
+        self.resumed = False
+
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        meta = read_meta(self.path) if resume else None
+        if meta:
+            self.resumed = True
+            self.outputs = meta['outputs']
+            self._load()
+            self._f = open(self.path, 'ab')
+        else:
+            self.outputs = dict(outputs)
+            self._f = open(self.path, 'wb')
+            self._write({
+                "type": "meta",
+                "kind": kind,
+                "user_id": user_id,
+                "since": since,
+                "until": until,
+                "outputs": self.outputs,
+                "started_at": datetime.now().isoformat()
+            })
+        self._reader = open(self.path, 'rb')
+
+    def _load(self):
+        """扫描已有日志，建立索引；丢弃中断时写了一半的最后一行"""
+        valid_size = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                record_type = record.get('type')
+                if record_type == 'commit_list':
+                    self.commit_lists[record['project_id']] = record['commit_ids']
+                elif record_type == 'commit':
+                    self.commit_offsets[(record['project_id'], record['commit']['id'])] = valid_size
+                elif record_type == 'project':
+                    self.projects_done.add(record['project_id'])
+                valid_size += len(line)
+        with open(self.path, 'r+b') as f:
+            f.truncate(valid_size)
+
+    def _write(self, record):
+        self._f.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+        self._f.flush()
+
+    def record_commit_list(self, project_id, commit_ids):
+        self.commit_lists[project_id] = commit_ids
+        self._write({"type": "commit_list", "project_id": project_id, "commit_ids": commit_ids})
+
+    def record_commit(self, project_id, commit):
+        self._f.flush()
+        offset = self._f.tell()
+        self._write({"type": "commit", "project_id": project_id, "commit": commit})
+        self.commit_offsets[(project_id, commit['id'])] = offset
+
+    def record_project_done(self, project_id):
+        self.projects_done.add(project_id)
+        self._write({"type": "project", "project_id": project_id})
+
+    def stored_commit(self, project_id, commit_sha):
+        """从日志中读取已获取的提交详情，没有则返回 None"""
+        offset = self.commit_offsets.get((project_id, commit_sha))
+        if offset is None:
+            return None
+        self._reader.seek(offset)
+        return json.loads(self._reader.readline())['commit']
+
+    def close(self):
+        """关闭日志，保留文件以便之后继续"""
+        self._f.close()
+        self._reader.close()
+
+    def finish(self):
+        """导出成功完成后删除检查点"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,468 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+用户提交记录导出格式
+
+@Description: 流式输出 JSON/NDJSON/CSV/HTML。提交记录边抓取边写入文件，
+              内存占用与提交数量无关；多个格式可以共用同一次抓取
+"""
+
+import csv
+import json
+from datetime import datetime
+from config import GITLAB_URL, COMMIT_DIFF_MODE
+
+
+def diff_stats(diff_info):
+    """统计文件变更数、新增行数和删除行数"""
+    files_changed = len(diff_info) if diff_info else 0
+    additions = sum(d.get('additions', 0) for d in diff_info) if diff_info else 0
+    deletions = sum(d.get('deletions', 0) for d in diff_info) if diff_info else 0
+    return files_changed, additions, deletions
+
+
+def commit_stats(commit):
+    """统计提交的文件变更数、新增行数和删除行数
+
+    行数优先取自提交详情的 stats 字段；文件变更数只能从差异中得到，未下载差异时为 None。
+    """
+    diff_info = commit.get('file_changes')
+    files_changed, additions, deletions = diff_stats(diff_info)
+    stats = commit.get('stats')
+    if stats:
+        additions, deletions = stats.get('additions', 0), stats.get('deletions', 0)
+    return (files_changed if diff_info is not None else None), additions, deletions
+
+
+# 报告中使用的提交字段，都包含在带 with_stats=true 的提交列表响应中
+COMMIT_FIELDS = (
+    'id', 'short_id', 'title', 'message', 'author_name', 'author_email',
+    'committer_name', 'committer_email', 'created_at', 'committed_date', 'web_url', 'stats'
+)
+
+
+def required_fields(format_types):
+    """给定的输出格式共同需要的提交字段
+
+    差异接口的文件变更不包含新增/删除行数，行数只能取自 stats，因此无论是否下载差异都不能省略 stats。
+    """
+    fields = []
+    for format_type in format_types:
+        fields.extend(field for field in WRITERS[format_type].fields if field not in fields)
+    return tuple(fields)
+
+
+def needs_diff(format_types):
+    """给定的输出格式是否需要下载每个提交的完整差异"""
+    return COMMIT_DIFF_MODE == 'always' or any(WRITERS[format_type].embeds_diff for format_type in format_types)
+
+
+def _dump(value, level):
+    """序列化为缩进的JSON片段，嵌套在第 level 层"""
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.replace('\n', '\n' + '  ' * level)
+
+
+class CommitWriter:
+    """流式输出的基类
+
+    info 包含 user_id、user_info、since、until、projects_scanned 和 export_type。
+    调用顺序：begin_project -> write_commit（多次）-> end_project，最后 close。
+    每个项目结束时刷新文件，中途失败也会留下可用的部分结果。
+    """
+
+    newline = None
+    encoding = 'utf-8'
+    # 输出中是否内嵌完整的文件变更（为 False 时只需要提交的 stats）
+    embeds_diff = False
+    # 输出使用的提交字段，提交列表中缺少其中任一字段时才获取提交详情
+    fields = COMMIT_FIELDS
+
+    def __init__(self, output_file, info):
+        self.output_file = output_file
+        self.info = info
+        self.total_commits = 0
+        self.f = open(output_file, 'w', encoding=self.encoding, newline=self.newline)
+        self.write_header()
+
+    def write_header(self):
+        pass
+
+    def begin_project(self, project, commit_count):
+        pass
+
+    def write_commit(self, project, commit):
+        self.total_commits += 1
+
+    def end_project(self, project, written):
+        self.f.flush()
+
+    def write_footer(self):
+        pass
+
+    def close(self):
+        """写入结尾并关闭文件，返回是否成功"""
+        try:
+            self.write_footer()
+            self.f.close()
+            print(f"\n用户提交记录已导出到: {self.output_file}")
+            print(f"总共导出 {self.total_commits} 个提交记录")
+            return True
+        except Exception as e:
+            print(f"保存文件 {self.output_file} 时出错: {str(e)}")
+            return False
+
+
+class JsonWriter(CommitWriter):
+    """流式JSON输出：逐个写入 projects 数组"""
+
+    embeds_diff = True
+
+    def write_header(self):
+        export_info = {
+            "export_time": datetime.now().isoformat(),
+            "gitlab_url": GITLAB_URL,
+            "export_type": self.info.get('export_type', 'user_commits'),
+            "user_id": self.info['user_id'],
+            "time_range": {
+                "since": self.info['since'],
+                "until": self.info['until']
+            }
+        }
+        self.f.write('{\n')
+        self.f.write(f'  "export_info": {_dump(export_info, 1)},\n')
+        self.f.write(f'  "user_info": {_dump(self.info["user_info"], 1)},\n')
+        self.f.write('  "projects": [')
+        self._first_project = True
+        self._open_project = None
+
+    def begin_project(self, project, commit_count):
+        self.f.write('\n' if self._first_project else ',\n')
+        self._first_project = False
+        self.f.write('    {\n')
+        self.f.write(f'      "project_info": {_dump(project, 3)},\n')
+        self.f.write('      "commits": [')
+        self._first_commit = True
+        self._open_project = (project, 0)
+
+    def write_commit(self, project, commit):
+        super().write_commit(project, commit)
+        self.f.write('\n        ' if self._first_commit else ',\n        ')
+        self._first_commit = False
+        self.f.write(_dump(commit, 4))
+        self._open_project = (project, self._open_project[1] + 1)
+
+    def end_project(self, project, written):
+        self.f.write('\n      ]' if written else ']')
+        self.f.write(f',\n      "commits_count": {written}\n    }}')
+        self._open_project = None
+        super().end_project(project, written)
+
+    def write_footer(self):
+        if self._open_project:
+            # 中途出错或中断时结束未完成的项目，保证部分结果仍是合法的JSON
+            self.end_project(*self._open_project)
+        self.f.write('\n  ]\n}\n' if not self._first_project else ']\n}\n')
+
+
+class NdjsonWriter(CommitWriter):
+    """NDJSON输出：每行一个JSON对象，崩溃后已写入的行仍然完整可用"""
+
+    embeds_diff = True
+
+    def _line(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write_header(self):
+        self._line({
+            "type": "export_info",
+            "export_time": datetime.now().isoformat(),
+            "gitlab_url": GITLAB_URL,
+            "export_type": self.info.get('export_type', 'user_commits'),
+            "user_id": self.info['user_id'],
+            "time_range": {"since": self.info['since'], "until": self.info['until']},
+            "user_info": self.info['user_info']
+        })
+
+    def begin_project(self, project, commit_count):
+        self._line({"type": "project", "project_info": project})
+
+    def write_commit(self, project, commit):
+        super().write_commit(project, commit)
+        self._line({"type": "commit", "project_id": project['id'], "commit": commit})
+
+
+class CsvWriter(CommitWriter):
+    """流式CSV输出：提交到达即写入一行"""
+
+    newline = ''
+    encoding = 'utf-8-sig'
+    fieldnames = [
+        'project_id', 'project_name', 'project_namespace',
+        'commit_id', 'commit_short_id', 'commit_title', 'commit_message',
+        'author_name', 'author_email', 'committer_name', 'committer_email',
+        'created_at', 'committed_date', 'files_changed', 'additions', 'deletions', 'web_url'
+    ]
+
+    def write_header(self):
+        self.writer = csv.DictWriter(self.f, fieldnames=self.fieldnames)
+        self.writer.writeheader()
+
+    def row(self, project, commit):
+        files_changed, additions, deletions = commit_stats(commit)
+        return {
+            'project_id': project['id'],
+            'project_name': project['name'],
+            'project_namespace': project['namespace'],
+            'commit_id': commit['id'],
+            'commit_short_id': commit['short_id'],
+            'commit_title': commit['title'],
+            'commit_message': commit['message'],
+            'author_name': commit['author_name'],
+            'author_email': commit['author_email'],
+            'committer_name': commit['committer_name'],
+            'committer_email': commit['committer_email'],
+            'created_at': commit['created_at'],
+            'committed_date': commit['committed_date'],
+            'files_changed': '' if files_changed is None else files_changed,
+            'additions': additions,
+            'deletions': deletions,
+            'web_url': commit.get('web_url', '')
+        }
+
+    def write_commit(self, project, commit):
+        super().write_commit(project, commit)
+        self.writer.writerow(self.row(project, commit))
+
+
+class DirectCsvWriter(CsvWriter):
+    """事件驱动导出的CSV输出，包含完整的项目信息列"""
+
+    fieldnames = [
+        'project_id', 'project_name', 'project_path', 'project_full_path',
+        'project_namespace', 'project_namespace_path', 'project_description',
+        'project_visibility', 'project_web_url', 'project_created_at',
+        'project_default_branch', 'project_total_commits', 'project_repository_size',
+        'commit_id', 'commit_short_id', 'commit_title', 'commit_message',
+        'author_name', 'author_email', 'committer_name', 'committer_email',
+        'created_at', 'committed_date', 'files_changed', 'additions', 'deletions', 'commit_web_url'
+    ]
+
+    def row(self, project_info, commit):
+        files_changed, additions, deletions = commit_stats(commit)
+        return {
+            'project_id': project_info['id'],
+            'project_name': project_info['name'],
+            'project_path': project_info.get('path', project_info['name']),
+            'project_full_path': project_info.get('path_with_namespace', f"{project_info.get('namespace', 'Unknown')}/{project_info['name']}"),
+            'project_namespace': project_info.get('namespace', 'Unknown'),
+            'project_namespace_path': project_info.get('namespace_path', 'Unknown'),
+            'project_description': project_info.get('description', '无描述'),
+            'project_visibility': project_info.get('visibility', 'Unknown'),
+            'project_web_url': project_info.get('web_url', ''),
+            'project_created_at': project_info.get('created_at', '未知'),
+            'project_default_branch': project_info.get('default_branch', 'main'),
+            'project_total_commits': project_info.get('commit_count', 0),
+            'project_repository_size': project_info.get('repository_size', 0),
+            'commit_id': commit['id'],
+            'commit_short_id': commit['short_id'],
+            'commit_title': commit['title'],
+            'commit_message': commit['message'],
+            'author_name': commit['author_name'],
+            'author_email': commit['author_email'],
+            'committer_name': commit['committer_name'],
+            'committer_email': commit['committer_email'],
+            'created_at': commit['created_at'],
+            'committed_date': commit['committed_date'],
+            'files_changed': '' if files_changed is None else files_changed,
+            'additions': additions,
+            'deletions': deletions,
+            'commit_web_url': commit.get('web_url', '')
+        }
+
+
+class HtmlWriter(CommitWriter):
+    """法律用途的HTML报告，按项目分段写入"""
+
+    fields = ('id', 'title', 'message', 'author_name', 'author_email',
+              'committer_name', 'committer_email', 'committed_date', 'stats')
+    # 报告头中额外的说明行（HTML 片段）
+    header_note = ''
+
+    def write_header(self):
+        user_info = self.info['user_info']
+        since = self.info['since']
+        until = self.info['until']
+        self.f.write(f"""
+<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>用户提交记录法律报告 - {user_info['name']}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }}
+        .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; margin-bottom: 20px; }}
+        .user-info {{ margin: 20px 0; }}
+        .project {{ margin: 20px 0; border: 1px solid #ddd; padding: 15px; border-radius: 5px; }}
+        .project h3 {{ color: #2c3e50; margin-top: 0; }}
+        .project h4 {{ color: #34495e; margin-top: 20px; }}
+        .commit {{ margin: 10px 0; padding: 15px; background-color: #f9f9f9; border-radius: 3px; border-left: 4px solid #3498db; }}
+        .timestamp {{ color: #666; font-size: 0.9em; }}
+        .commit-id {{ font-family: monospace; font-size: 0.8em; background-color: #ecf0f1; padding: 2px 5px; border-radius: 3px; }}
+        table {{ width: 100%; border-collapse: collapse; margin: 10px 0; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
+        th {{ background-color: #f2f2f2; font-weight: bold; width: 200px; }}
+        .project-info th {{ background-color: #e8f4f8; }}
+        .commit-stats th {{ background-color: #e8f8f5; }}
+        .summary {{ background-color: #fef9e7; padding: 15px; border-radius: 5px; margin-top: 20px; }}
+        .footer {{ margin-top: 20px; padding-top: 20px; border-top: 1px solid #ddd; color: #666; font-size: 0.9em; }}
+        a {{ color: #3498db; text-decoration: none; }}
+        a:hover {{ text-decoration: underline; }}
+        pre {{ background-color: #f8f9fa; padding: 10px; border-radius: 3px; overflow-x: auto; }}
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h1>用户提交记录法律报告</h1>
+        <p><strong>导出时间：</strong>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+        <p><strong>数据来源：</strong>{GITLAB_URL}</p>
+        <p><strong>时间范围：</strong>{since or '所有时间'} 至 {until or '现在'}</p>
+        {self.header_note}
+    </div>
+
+    <div class="user-info">
+        <h2>用户信息</h2>
+        <table>
+            <tr><th>用户ID</th><td>{user_info['id']}</td></tr>
+            <tr><th>用户名</th><td>{user_info['username']}</td></tr>
+            <tr><th>姓名</th><td>{user_info['name']}</td></tr>
+            <tr><th>邮箱</th><td>{user_info.get('email', '未提供')}</td></tr>
+            <tr><th>注册时间</th><td>{user_info.get('created_at', '未知')}</td></tr>
+            <tr><th>最后活动</th><td>{user_info.get('last_activity_on', '未知')}</td></tr>
+        </table>
+    </div>
+
+    <div class="projects">
+        <h2>项目提交记录</h2>
+""")
+
+    def begin_project(self, project, commit_count):
+        self.f.write(f"""
+        <div class="project">
+            <h3>{project['name']} (ID: {project['id']})</h3>
+            <p><strong>命名空间：</strong>{project['namespace']}</p>
+            <p><strong>提交数量：</strong>{commit_count}</p>
+
+            <div class="commits">
+""")
+
+    def write_commit(self, project, commit):
+        super().write_commit(project, commit)
+        files_changed, additions, deletions = commit_stats(commit)
+        self.f.write(f"""
+                <div class="commit">
+                    <h4>{commit['title']}</h4>
+                    <p class="commit-id"><strong>提交ID：</strong>{commit['id']}</p>
+                    <p class="timestamp"><strong>提交时间：</strong>{commit['committed_date']}</p>
+                    <p><strong>作者：</strong>{commit['author_name']} &lt;{commit['author_email']}&gt;</p>
+                    <p><strong>提交者：</strong>{commit['committer_name']} &lt;{commit['committer_email']}&gt;</p>
+                    <p><strong>修改文件数：</strong>{'未统计' if files_changed is None else files_changed}</p>
+                    <p><strong>变更行数：</strong>+{additions} / -{deletions}</p>
+                    <p><strong>提交消息：</strong></p>
+                    <pre>{commit['message']}</pre>
+                </div>
+""")
+
+    def end_project(self, project, written):
+        self.f.write("""
+            </div>
+        </div>
+""")
+        super().end_project(project, written)
+
+    def write_footer(self):
+        self.f.write(f"""
+    </div>
+
+    <div class="summary">
+        <h2>统计摘要</h2>
+        <p><strong>总提交数：</strong>{self.total_commits}</p>
+        <p><strong>涉及项目数：</strong>{self.info['projects_scanned']}</p>
+    </div>
+
+    <div class="footer">
+        <p><em>此报告由 GitLab 项目导出工具生成，数据来源于 {GITLAB_URL}</em></p>
+        <p><em>报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</em></p>
+    </div>
+</body>
+</html>
+""")
+
+
+class DirectHtmlWriter(HtmlWriter):
+    """事件驱动导出的HTML报告，包含完整的项目信息和每个项目的提交统计
+
+    统计随提交累加，写在项目的提交列表之后，不需要预先保留项目的全部提交。
+    """
+
+    header_note = '<p><strong>导出方法：</strong>直接通过用户事件API获取</p>'
+
+    def begin_project(self, project, commit_count):
+        self._files_changed = 0
+        self._additions = 0
+        self._deletions = 0
+        self.f.write(f"""
+        <div class="project">
+            <h3>{project['name']} (ID: {project['id']})</h3>
+            <table class="project-info">
+                <tr><th>项目路径</th><td>{project.get('path_with_namespace', 'Unknown')}</td></tr>
+                <tr><th>命名空间</th><td>{project.get('namespace', 'Unknown')}</td></tr>
+                <tr><th>项目描述</th><td>{project.get('description', '无描述')}</td></tr>
+                <tr><th>可见性</th><td>{project.get('visibility', 'Unknown')}</td></tr>
+                <tr><th>默认分支</th><td>{project.get('default_branch', 'main')}</td></tr>
+                <tr><th>项目创建时间</th><td>{project.get('created_at', '未知')}</td></tr>
+                <tr><th>最后活动时间</th><td>{project.get('last_activity_at', '未知')}</td></tr>
+                <tr><th>项目总提交数</th><td>{project.get('commit_count', 0)}</td></tr>
+                <tr><th>仓库大小</th><td>{project.get('repository_size', 0)} 字节</td></tr>
+                <tr><th>项目链接</th><td><a href="{project.get('web_url', '')}" target="_blank">{project.get('web_url', '')}</a></td></tr>
+            </table>
+
+            <div class="commits">
+""")
+
+    def write_commit(self, project, commit):
+        super().write_commit(project, commit)
+        files_changed, additions, deletions = commit_stats(commit)
+        if files_changed is None:
+            self._files_changed = '未统计'
+        elif self._files_changed != '未统计':
+            self._files_changed += files_changed
+        self._additions += additions
+        self._deletions += deletions
+
+    def end_project(self, project, written):
+        net = self._additions - self._deletions
+        self.f.write(f"""
+            </div>
+
+            <h4>用户在此项目的提交统计</h4>
+            <table class="commit-stats">
+                <tr><th>用户提交数</th><td>{written}</td></tr>
+                <tr><th>总文件变更数</th><td>{self._files_changed}</td></tr>
+                <tr><th>总新增行数</th><td style="color: green;">+{self._additions}</td></tr>
+                <tr><th>总删除行数</th><td style="color: red;">-{self._deletions}</td></tr>
+                <tr><th>净变更行数</th><td style="color: {'green' if net >= 0 else 'red'};">{'+' if net >= 0 else ''}{net}</td></tr>
+            </table>
+        </div>
+""")
+        CommitWriter.end_project(self, project, written)
+
+
+# 导出格式 -> 输出类，新增格式时在此注册
+WRITERS = {
+    "json": JsonWriter,
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+    "html": HtmlWriter,
+}
@@ -13,4 +13,63 @@ GITLAB_URL = config['gitlab']['url']
 PRIVATE_TOKEN = config['gitlab']['private_token']
 OUTPUT_DIR = config['output']['dir']
 MAX_RETRIES = config['download']['max_retries']
-RETRY_DELAY = config['download']['retry_delay'] 
\ No newline at end of file
+RETRY_DELAY = config['download']['retry_delay']
+DOWNLOAD_SEGMENTS = config['download'].get('segments', 4)
+SEGMENT_MIN_SIZE = config['download'].get('segment_min_size_mb', 64) * 1024 * 1024
+
+# HTTP 连接配置（可选）
+HTTP_CONFIG = config.get('http') or {}
+HTTP_POOL_SIZE = HTTP_CONFIG.get('pool_size', 10)
+HTTP_TIMEOUT = HTTP_CONFIG.get('timeout', 60)
+PAGE_WORKERS = HTTP_CONFIG.get('page_workers', 4)
+
+# 限流配置（可选）
+RATE_LIMIT_CONFIG = config.get('rate_limit') or {}
+RATE_LIMIT_ENABLED = RATE_LIMIT_CONFIG.get('enabled', True)
+RATE_LIMIT_MAX_RATE = RATE_LIMIT_CONFIG.get('max_rate', 20)
+RATE_LIMIT_MIN_RATE = RATE_LIMIT_CONFIG.get('min_rate', 0.5)
+RATE_LIMIT_MAX_RETRIES = RATE_LIMIT_CONFIG.get('max_retries', 5)
+
+# 响应缓存配置（可选）
+CACHE_CONFIG = config.get('cache') or {}
+CACHE_ENABLED = CACHE_CONFIG.get('enabled', True)
+CACHE_PATH = CACHE_CONFIG.get('path', os.path.join('.cache', 'http_cache.sqlite3'))
+CACHE_MAX_SIZE = CACHE_CONFIG.get('max_size_mb', 512) * 1024 * 1024
+# 进程内缓存：用户、项目详情和当前用户的查询结果
+MEMO_TTL = CACHE_CONFIG.get('memo_ttl', 300)
+MEMO_MAX_ENTRIES = CACHE_CONFIG.get('memo_max_entries', 1024)
+
+# 批量导出配置（可选）
+BATCH_CONFIG = config.get('batch') or {}
+MAX_CONCURRENT_EXPORTS = BATCH_CONFIG.get('max_concurrent_exports', 4)
+DOWNLOAD_WORKERS = BATCH_CONFIG.get('download_workers', 2)
+POLL_INTERVAL = BATCH_CONFIG.get('poll_interval', 5)
+MAX_POLL_INTERVAL = BATCH_CONFIG.get('max_poll_interval', 60)
+
+# 项目目录同步配置（可选）
+CATALOG_CONFIG = config.get('catalog') or {}
+CATALOG_RECONCILE_INTERVAL = CATALOG_CONFIG.get('reconcile_hours', 24) * 3600
+CATALOG_SYNC_OVERLAP = CATALOG_CONFIG.get('sync_overlap_minutes', 5) * 60
+
+# 去重归档存储配置（可选）
+STORE_CONFIG = config.get('store') or {}
+STORE_ENABLED = STORE_CONFIG.get('enabled', False)
+STORE_PATH = STORE_CONFIG.get('path', os.path.join(OUTPUT_DIR, 'store'))
+STORE_KEEP_SNAPSHOTS = STORE_CONFIG.get('keep_snapshots', 90)
+STORE_KEEP_ARCHIVE = STORE_CONFIG.get('keep_archive', True)
+
+# 本地镜像配置（可选）
+MIRROR_CONFIG = config.get('mirror') or {}
+MIRROR_ENABLED = MIRROR_CONFIG.get('enabled', False)
+MIRROR_PATH = MIRROR_CONFIG.get('path', os.path.join('.cache', 'mirrors'))
+MIRROR_WORKERS = MIRROR_CONFIG.get('workers', 4)
+MIRROR_TIMEOUT = MIRROR_CONFIG.get('timeout', 1800)
+BUNDLE_PATH = MIRROR_CONFIG.get('bundle_path', os.path.join(OUTPUT_DIR, 'bundles'))
+BUNDLE_FULL_EVERY = MIRROR_CONFIG.get('full_bundle_every', 30)
+
+# 提交记录导出配置（可选）
+COMMIT_EXPORT_CONFIG = config.get('commit_export') or {}
+ASYNC_ENABLED = COMMIT_EXPORT_CONFIG.get('async_enabled', True)
+FETCH_CONCURRENCY = COMMIT_EXPORT_CONFIG.get('concurrency', 8)
+# auto：只有内嵌文件变更的格式（JSON/NDJSON）才下载差异；always：所有格式都下载
+COMMIT_DIFF_MODE = COMMIT_EXPORT_CONFIG.get('diff_mode', 'auto')
\ No newline at end of file
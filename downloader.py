@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+可续传的分段下载模块
+
+@Description: 下载内容先写入 .part 文件，进度记录在 .part.json 中；
+              中断后通过 HTTP Range 从断点继续，服务器支持 Range 时可并行下载多个分段
+"""
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from tqdm import tqdm
+from config import DOWNLOAD_SEGMENTS, SEGMENT_MIN_SIZE
+from archive_verify import IntegrityError, feed_file
+
+CHUNK_MIN = 64 * 1024
+CHUNK_MAX = 4 * 1024 * 1024
+# 每次读取的目标耗时（秒），块大小据此在 CHUNK_MIN 和 CHUNK_MAX 之间调整
+CHUNK_TARGET_SECONDS = 0.5
+# 进度文件的保存间隔（字节）
+STATE_SAVE_INTERVAL = 8 * 1024 * 1024
+
+
+def iter_adaptive_chunks(response):
+    """按吞吐量自适应调整块大小读取响应体"""
+    chunk_size = CHUNK_MIN
+    while True:
+        started = time.monotonic()
+        chunk = response.raw.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+        elapsed = time.monotonic() - started
+        if elapsed < CHUNK_TARGET_SECONDS / 2 and chunk_size < CHUNK_MAX:
+            chunk_size *= 2
+        elif elapsed > CHUNK_TARGET_SECONDS and chunk_size > CHUNK_MIN:
+            chunk_size //= 2
+
+
+class DownloadState:
+    """.part 文件的下载进度
+
+    segments 为 [起始偏移, 结束偏移(不含), 已下载字节数] 列表；
+    validator 为服务器返回的 ETag 或 Last-Modified，续传时通过 If-Range 校验文件未变化。
+    """
+
+    def __init__(self, path, total, validator, segments):
+        self.path = path
+        self.total = total
+        self.validator = validator
+        self.segments = segments
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+    @classmethod
+    def plan(cls, path, total, validator, segment_count):
+        size = -(-total // segment_count)
+        segments = [[start, min(start + size, total), 0] for start in range(0, total, size)]
+        return cls(path, total, validator, segments)
+
+    @classmethod
+    def load(cls, path):
+        """读取进度文件，不存在或损坏时返回 None"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(path, data['total'], data.get('validator'), data['segments'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @property
+    def downloaded(self):
+        return sum(done for _, _, done in self.segments)
+
+    def advance(self, index, size):
+        """记录某个分段新写入的字节数，定期保存进度"""
+        with self._lock:
+            self.segments[index][2] += size
+            self._unsaved += size
+            if self._unsaved >= STATE_SAVE_INTERVAL:
+                self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"total": self.total, "validator": self.validator, "segments": self.segments}, f)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+def _validator(response):
+    return response.headers.get('ETag') or response.headers.get('Last-Modified')
+
+
+def _range_total(response):
+    """从 Content-Range（bytes 起始-结束/总大小）中取得文件总大小"""
+    total = response.headers.get('Content-Range', '').rpartition('/')[2]
+    return int(total) if total.isdigit() else None
+
+
+def _paths(filepath):
+    part_path = f"{filepath}.part"
+    return part_path, f"{part_path}.json"
+
+
+def has_partial(filepath):
+    """是否存在上次中断、可以通过 Range 续传的 .part 文件"""
+    part_path, state_path = _paths(filepath)
+    return os.path.exists(part_path) and DownloadState.load(state_path) is not None
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _download_segment(open_response, part_path, state, index, pbar, stop, response=None, verifier=None):
+    """下载一个分段并写入 .part 文件的对应位置（传入 verifier 时同时按顺序校验）"""
+    start, end, done = state.segments[index]
+    if start + done >= end:
+        return
+    if response is None:
+        headers = {"Range": f"bytes={start + done}-{end - 1}"}
+        if state.validator:
+            headers["If-Range"] = state.validator
+        response = open_response(headers)
+        if response.status_code in (200, 416) or (response.status_code == 206 and
+                                                  _range_total(response) not in (None, state.total)):
+            # If-Range 不匹配时服务器返回完整文件（200）
+            response.close()
+            raise requests.HTTPError(f"分段续传失败（状态码 {response.status_code}），服务器上的文件已变化",
+                                     response=response)
+        if response.status_code != 206:
+            response.close()
+            raise requests.ConnectionError(f"分段请求失败（状态码 {response.status_code}）")
+
+    with response, open(part_path, 'r+b', buffering=0) as f:
+        f.seek(start + done)
+        for chunk in iter_adaptive_chunks(response):
+            if stop.is_set():
+                return
+            chunk = chunk[:end - start - state.segments[index][2]]
+            f.write(chunk)
+            if verifier is not None:
+                verifier.update(chunk)
+            state.advance(index, len(chunk))
+            pbar.update(len(chunk))
+            if state.segments[index][2] >= end - start:
+                break
+
+    if state.segments[index][2] < end - start:
+        raise requests.ConnectionError(f"分段 {index} 下载不完整")
+
+
+def _download_unsized(response, part_path, show_progress, verifier=None):
+    """服务器未返回文件大小时只能整体下载"""
+    with response, open(part_path, 'wb') as f:
+        with tqdm(unit='B', unit_scale=True, desc="下载进度", disable=not show_progress) as pbar:
+            for chunk in iter_adaptive_chunks(response):
+                f.write(chunk)
+                if verifier is not None:
+                    verifier.update(chunk)
+                pbar.update(len(chunk))
+
+
+def _check(verifier, part_path, state_path, total=None):
+    """检查校验结果，不通过时删除 .part 文件并抛出 IntegrityError"""
+    result = verifier.result()
+    error = result['error']
+    if not error and total is not None and result['size'] != total:
+        error = f"大小不一致（{result['size']} / {total} 字节）"
+    if error:
+        _remove(part_path, state_path)
+        raise IntegrityError(f"归档校验失败: {error}")
+
+
+def resume_download(open_response, filepath, show_progress=True, verifier=None):
+    """从已有的 .part 文件继续下载，直接发起 Range 请求（不先发起完整的 GET）
+
+    open_response(headers) 用于发起分段请求，If-Range 携带上次记录的 ETag/Last-Modified；
+    服务器没有提供时通过 Content-Range 中的文件大小和下载完成后的完整性校验发现文件变化。
+    下载完成时返回 True；没有可续传的进度，或服务器上的文件已变化（旧的 .part 已删除）时返回 False，
+    调用方应重新下载（传入的 verifier 可能已被使用，需要换新的）。下载中断时抛出异常，进度保留。
+    """
+    if not has_partial(filepath):
+        return False
+    _, state_path = _paths(filepath)
+    state = DownloadState.load(state_path)
+    print(f"从断点继续下载（已下载 {state.downloaded / 1024 / 1024:.1f} MB）")
+    try:
+        _transfer(state, None, open_response, filepath, show_progress, verifier)
+    except requests.HTTPError:
+        print("服务器上的文件已变化，重新下载")
+        return False
+    return True
+
+
+def download_file(response, open_response, filepath, show_progress=True,
+                  segments=DOWNLOAD_SEGMENTS, segment_min_size=SEGMENT_MIN_SIZE, verifier=None):
+    """可续传地下载文件到 filepath
+
+    response 为调用方已发起的流式 GET 请求（状态码 200），用于获取文件大小和是否支持 Range；
+    open_response(headers) 用于发起分段请求。文件足够大且支持 Range 时拆分为多个分段并行下载。
+    下载中断时抛出异常，.part 文件和进度保留，之后由 resume_download 继续。
+
+    传入 verifier（archive_verify.StreamVerifier）时，第一个分段（单连接下载时即整个文件）在写入的同时校验；
+    其余分段的数据不按顺序到达，全部完成后再从 .part 文件中读入这部分校验。
+    校验不通过时删除 .part 文件并抛出 IntegrityError。
+    """
+    part_path, state_path = _paths(filepath)
+
+    total = int(response.headers.get('Content-Length') or 0)
+    accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+    if not total:
+        _download_unsized(response, part_path, show_progress, verifier)
+        if verifier is not None:
+            _check(verifier, part_path, state_path)
+        os.replace(part_path, filepath)
+        return True
+
+    count = segments if accepts_ranges and total >= segment_min_size * 2 else 1
+    count = max(1, min(count, total // segment_min_size or 1))
+    state = DownloadState.plan(state_path, total, _validator(response), count)
+    with open(part_path, 'wb') as f:
+        f.truncate(total)
+    state.save()
+    if count > 1:
+        response.close()
+        response = None
+    _transfer(state, response, open_response, filepath, show_progress, verifier)
+    return True
+
+
+def _transfer(state, response, open_response, filepath, show_progress, verifier):
+    """下载 state 中未完成的分段，校验后将 .part 文件改名为 filepath"""
+    part_path, state_path = _paths(filepath)
+    first_end, first_done = state.segments[0][1], state.segments[0][2]
+    if verifier is not None and first_done:
+        # 续传时先校验第一个分段已下载的部分
+        feed_file(verifier, part_path, 0, first_done)
+
+    stop = threading.Event()
+    with tqdm(total=state.total, initial=state.downloaded, unit='B', unit_scale=True,
+              desc="下载进度", disable=not show_progress) as pbar:
+        try:
+            if len(state.segments) == 1:
+                _download_segment(open_response, part_path, state, 0, pbar, stop, response, verifier)
+            else:
+                # 第一个分段从文件开头按顺序到达，下载的同时校验
+                with ThreadPoolExecutor(max_workers=len(state.segments)) as pool:
+                    futures = [pool.submit(_download_segment, open_response, part_path, state, i, pbar, stop,
+                                           verifier=verifier if i == 0 else None)
+                               for i in range(len(state.segments))]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        # 通知其他分段尽快停止，避免线程池退出时长时间等待
+                        stop.set()
+                        raise
+        except requests.HTTPError:
+            # 服务器上的文件已变化，旧的分段作废
+            stop.set()
+            _remove(part_path, state_path)
+            raise
+        except BaseException:
+            stop.set()
+            state.save()
+            raise
+
+    if verifier is not None:
+        if first_end < state.total:
+            # 其余分段完成后再按顺序读入
+            feed_file(verifier, part_path, first_end)
+        _check(verifier, part_path, state_path, state.total)
+
+    os.replace(part_path, filepath)
+    _remove(state_path)
@@ -0,0 +1,137 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from config import GITLAB_URL
+
+EVENTS_DIR = os.path.join(".cache", "events")
+
+
+def events_path(gitlab_url=GITLAB_URL):
+    """用户推送事件库的位置（按 GitLab 域名区分）"""
+    domain = gitlab_url.split('://')[1].rstrip('/').replace(':', '_')
+    return os.path.join(EVENTS_DIR, f"{domain}.sqlite3")
+
+
+def parse_time(value):
+    """解析 GitLab 的时间字符串（或 YYYY-MM-DD），返回带时区的 datetime"""
+    if len(value) == 10:
+        value += "T00:00:00Z"
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+def day_before(created_at):
+    """events 接口的 after 参数按日期过滤且不含当天，返回游标前一天的日期"""
+    return (parse_time(created_at) - timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def filter_events(events, since=None, until=None):
+    """筛选 created_at 在 [since, until] 内的事件"""
+    since = parse_time(since) if since else None
+    until = parse_time(until) if until else None
+    return [event for event in events
+            if not (since and parse_time(event['created_at']) < since)
+            and not (until and parse_time(event['created_at']) > until)]
+
+
+class EventStore:
+    """本地保存的用户推送事件
+
+    事件创建后不会再变化，按 (user_id, id) 保存；cursors 表记录每个用户已同步到的
+    最新事件（id 和 created_at）以及已覆盖的起始时间 covered_from（空字符串表示全部历史）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                user_id INTEGER NOT NULL,
+                id INTEGER NOT NULL,
+                created_at TEXT NOT NULL,
+                body TEXT NOT NULL,
+                PRIMARY KEY (user_id, id)
+            );
+            CREATE TABLE IF NOT EXISTS cursors (
+                user_id INTEGER PRIMARY KEY,
+                covered_from TEXT NOT NULL,
+                last_event_id INTEGER,
+                last_created_at TEXT,
+                synced_at TEXT NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    def cursor(self, user_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM cursors WHERE user_id = ?", (user_id,)).fetchone()
+        return dict(row) if row else None
+
+    def covers(self, user_id, since):
+        """本地事件是否已覆盖 since 之后的全部历史，返回游标（未覆盖时为 None）"""
+        cursor = self.cursor(user_id)
+        if not cursor:
+            return None
+        covered_from = cursor['covered_from']
+        if covered_from and (not since or parse_time(since) < parse_time(covered_from)):
+            return None
+        return cursor
+
+    def save(self, user_id, events, covered_from=None):
+        """保存新获取的事件并推进游标；covered_from 不为 None 时同时更新覆盖的起始时间"""
+        rows = [(user_id, event['id'], event['created_at'], json.dumps(event, ensure_ascii=False))
+                for event in events]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO events (user_id, id, created_at, body) VALUES (?, ?, ?, ?)", rows)
+            latest = self._conn.execute(
+                "SELECT id, created_at FROM events WHERE user_id = ? ORDER BY id DESC LIMIT 1",
+                (user_id,)).fetchone()
+            previous = self._conn.execute(
+                "SELECT covered_from FROM cursors WHERE user_id = ?", (user_id,)).fetchone()
+            if covered_from is None:
+                covered_from = previous['covered_from'] if previous else ''
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cursors (user_id, covered_from, last_event_id, last_created_at, synced_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, covered_from, latest['id'] if latest else None,
+                 latest['created_at'] if latest else None, datetime.now().isoformat()))
+            self._conn.commit()
+        return len(rows)
+
+    def events(self, user_id, since=None, until=None):
+        """返回用户在 [since, until] 内的事件，按时间从新到旧"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT body FROM events WHERE user_id = ? ORDER BY id DESC", (user_id,)).fetchall()
+        return filter_events([json.loads(row['body']) for row in rows], since, until)
+
+    def clear(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._conn.execute("DELETE FROM events")
+                self._conn.execute("DELETE FROM cursors")
+            else:
+                self._conn.execute("DELETE FROM events WHERE user_id = ?", (user_id,))
+                self._conn.execute("DELETE FROM cursors WHERE user_id = ?", (user_id,))
+            self._conn.commit()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """获取当前 GitLab 实例的推送事件库"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EventStore(events_path())
+    return _store
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+项目导出状态跟踪模块
+
+@Description: 根据仓库大小估算导出耗时，按剩余时间安排带抖动的轮询间隔，
+              一次轮询只检查到期的导出，并给出真实的已用时间和预计剩余时间
+"""
+
+import time
+import random
+from config import POLL_INTERVAL, MAX_POLL_INTERVAL
+
+# 导出耗时估算：固定开销 + 按仓库大小的吞吐量
+EXPORT_BASE_SECONDS = 15
+EXPORT_BYTES_PER_SECOND = 5 * 1024 * 1024
+# 轮询间隔的随机抖动幅度，避免多个导出同时轮询
+JITTER = 0.2
+
+FINAL_STATUSES = ("finished", "failed", "none")
+
+
+def estimate_export_seconds(repository_size):
+    """根据仓库大小（字节）估算导出耗时（秒）"""
+    return EXPORT_BASE_SECONDS + (repository_size or 0) / EXPORT_BYTES_PER_SECOND
+
+
+class ExportWatcher:
+    """跟踪一个或多个进行中的导出
+
+    距预计完成时间还远时，间隔取剩余时间的一半；超过预计时间后从 min_interval
+    开始指数增长，所有间隔都限制在 [min_interval, max_interval] 内并加入随机抖动。
+    """
+
+    def __init__(self, min_interval=POLL_INTERVAL, max_interval=MAX_POLL_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.polls = 0
+        self._exports = {}
+
+    def add(self, project_id, repository_size=0):
+        """开始跟踪一个导出（在触发导出后调用）"""
+        now = time.monotonic()
+        entry = {
+            "started": now,
+            "expected": estimate_export_seconds(repository_size),
+            "overdue_polls": 0,
+            "status": None,
+        }
+        entry["next_poll"] = now + self._delay(entry, now)
+        self._exports[project_id] = entry
+
+    def remove(self, project_id):
+        self._exports.pop(project_id, None)
+
+    def __len__(self):
+        return len(self._exports)
+
+    def __contains__(self, project_id):
+        return project_id in self._exports
+
+    def _delay(self, entry, now):
+        remaining = entry["expected"] - (now - entry["started"])
+        if remaining > 0:
+            delay = remaining / 2
+        else:
+            delay = self.min_interval * 2 ** entry["overdue_polls"]
+            entry["overdue_polls"] += 1
+        delay = min(max(delay, self.min_interval), self.max_interval)
+        return delay * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def due(self):
+        """返回已到轮询时间的导出"""
+        now = time.monotonic()
+        return [pid for pid, entry in self._exports.items() if entry["next_poll"] <= now]
+
+    def seconds_until_due(self):
+        """距离下一个导出需要轮询的秒数"""
+        if not self._exports:
+            return None
+        return max(0.0, min(e["next_poll"] for e in self._exports.values()) - time.monotonic())
+
+    def sweep(self, check_status):
+        """检查所有到期的导出，返回 [(项目ID, 状态)]
+
+        check_status(project_id) 返回导出状态；进入最终状态的导出不再跟踪，
+        其余导出按新的间隔重新安排。
+        """
+        results = []
+        for project_id in self.due():
+            status = check_status(project_id)
+            self.polls += 1
+            entry = self._exports[project_id]
+            entry["status"] = status
+            if status in FINAL_STATUSES:
+                self.remove(project_id)
+            else:
+                now = time.monotonic()
+                entry["next_poll"] = now + self._delay(entry, now)
+            results.append((project_id, status))
+        return results
+
+    def progress(self, project_id):
+        """返回 (已用秒数, 预计剩余秒数, 估算完成比例)"""
+        entry = self._exports[project_id]
+        elapsed = time.monotonic() - entry["started"]
+        # 超过估算时间后，按已用时间的 1.25 倍重新估计
+        expected = max(entry["expected"], elapsed * 1.25)
+        return elapsed, expected - elapsed, min(0.99, elapsed / expected)
+
+    def wait(self, project_id, check_status, pbar=None):
+        """阻塞等待单个导出进入最终状态，返回最终状态
+
+        传入 tqdm 进度条时按估算比例更新，并显示已用时间和预计剩余时间。
+        """
+        while True:
+            for pid, status in self.sweep(check_status):
+                if pid == project_id and status in FINAL_STATUSES:
+                    return status
+
+            deadline = time.monotonic() + self.seconds_until_due()
+            while time.monotonic() < deadline:
+                if pbar is not None:
+                    elapsed, remaining, fraction = self.progress(project_id)
+                    pbar.update(int(fraction * pbar.total) - pbar.n)
+                    pbar.set_postfix_str(f"已用 {elapsed:.0f}s，预计剩余 {remaining:.0f}s")
+                time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
@@ -3,6 +3,7 @@ import yaml
 import re
 from pathlib import Path
 from config import OUTPUT_DIR, GITLAB_URL
+from project_catalog import get_catalog
 
 def ensure_output_dir():
     """确保输出目录存在"""
@@ -13,70 +14,50 @@ def clean_filename(filename):
     # 移除所有非字母、数字、下划线、连字符和点的字符
     return re.sub(r'[^\w\-\.]', '', filename)
 
-def save_projects_to_file(projects):
-    """将项目列表保存到本地文件"""
-    try:
-        # 创建projects目录
-        projects_dir = "projects"
-        os.makedirs(projects_dir, exist_ok=True)
-        
-        # 从GitLab URL中提取域名
-        domain = GITLAB_URL.split('://')[1].rstrip('/').replace(':', '_')
-        filename = f"{domain}.yaml"
-        filepath = os.path.join(projects_dir, filename)
-        
-        # 准备要保存的数据
-        projects_data = {
-            "gitlab_url": GITLAB_URL,
-            "projects": [
-                {
-                    "id": project["id"],
-                    "name": project["name"],
-                    "path": project["path"],
-                    "namespace": project["namespace"]["name"],
-                    "last_activity_at": project.get("last_activity_at", "未知")
-                }
-                for project in projects
-            ]
-        }
-        
-        # 保存到文件
-        with open(filepath, 'w', encoding='utf-8') as f:
-            yaml.dump(projects_data, f, allow_unicode=True, sort_keys=False)
-        
-        print(f"\n项目列表已保存到: {filepath}")
-        return True
-    except Exception as e:
-        print(f"保存项目列表时出错: {str(e)}")
+def _legacy_projects_file():
+    """旧版本保存的 YAML 项目列表路径"""
+    domain = GITLAB_URL.split('://')[1].rstrip('/').replace(':', '_')
+    return os.path.join("projects", f"{domain}.yaml")
+
+def _migrate_legacy_file(catalog):
+    """将旧版本的 YAML 项目列表导入项目目录（只执行一次）"""
+    filepath = _legacy_projects_file()
+    if not os.path.exists(filepath):
         return False
+    with open(filepath, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    catalog.replace_all(data.get('projects') or [])
+    print(f"已将旧的项目列表 {filepath} 导入到 {catalog.path}")
+    return True
 
 def load_projects_file():
-    """加载项目列表文件"""
-    projects_dir = "projects"
-    domain = GITLAB_URL.split('://')[1].rstrip('/').replace(':', '_')
-    filename = f"{domain}.yaml"
-    filepath = os.path.join(projects_dir, filename)
-    
+    """加载本地项目目录中的项目列表"""
     try:
-        if not os.path.exists(filepath):
-            print(f"未找到项目列表文件: {filepath}")
+        catalog = get_catalog()
+        if not catalog.count() and not _migrate_legacy_file(catalog):
+            print(f"未找到项目列表: {catalog.path}")
             print("请先使用功能1查询项目列表")
             return None
-            
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
-            return data
+        return {
+            "gitlab_url": GITLAB_URL,
+            "synced_at": catalog.get_meta("last_sync"),
+            "projects": catalog.all()
+        }
     except Exception as e:
-        print(f"读取项目列表文件时出错: {str(e)}")
+        print(f"读取项目列表时出错: {str(e)}")
         return None
 
 def get_project_info(project_id):
-    """获取项目信息"""
-    data = load_projects_file()
-    if not data:
+    """按项目ID查询项目信息（索引查询，不加载整个列表）"""
+    try:
+        catalog = get_catalog()
+        if not catalog.count():
+            _migrate_legacy_file(catalog)
+        return catalog.get(project_id)
+    except Exception as e:
+        print(f"读取项目信息时出错: {str(e)}")
         return None
-        
-    for project in data['projects']:
-        if project['id'] == project_id:
-            return project
-    return None 
\ No newline at end of file
+
+def find_project_by_path(path_with_namespace):
+    """按完整路径（命名空间/项目）查询项目信息"""
+    return get_catalog().find_by_path(path_with_namespace)
@@ -1,50 +1,81 @@
-import requests
 import time
-from tqdm import tqdm
-from config import GITLAB_URL, PRIVATE_TOKEN, MAX_RETRIES, RETRY_DELAY
+from datetime import datetime, timedelta
+from config import (MAX_RETRIES, RETRY_DELAY, STORE_ENABLED, STORE_KEEP_ARCHIVE,
+                    CATALOG_RECONCILE_INTERVAL, CATALOG_SYNC_OVERLAP)
+from gitlab_client import get_client
+from project_catalog import get_catalog
+from downloader import download_file, resume_download, has_partial
+from rate_limiter import retry_after
+from backup_manifest import record_backup
+from archive_store import store_archive, prune_snapshots
+from archive_verify import StreamVerifier, write_sidecar, sidecar_path
 import os
 
-def get_projects(save_automatically=False):
-    """获取所有项目列表"""
-    url = f"{GITLAB_URL}/api/v4/projects"
-    params = {
-        "simple": "true",
-        "per_page": 100
-    }
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
+def sync_project_catalog(full=False):
+    """同步本地项目目录，返回本次获取的项目数
     
+    平时只请求 last_activity_after 高水位之后有活动的项目并写入目录；
+    目录为空、距上次完整同步超过 reconcile_hours 或 full 为 True 时获取全部项目，
+    同时删除服务器上已不存在的项目。失败时抛出异常。
+    """
+    catalog = get_catalog()
+    client = get_client()
+    params = {"simple": "true", "per_page": 100}
+    high_water = catalog.get_meta("last_activity_high_water")
+    last_full = catalog.get_meta("last_full_sync")
+    
+    if not (high_water and last_full and catalog.count()):
+        full = True
+    elif not full:
+        full = (datetime.now() - datetime.fromisoformat(last_full)).total_seconds() >= CATALOG_RECONCILE_INTERVAL
+    
+    if full:
+        projects = client.fetch_all_pages("/projects", params=params, keyset_fallback=True)
+        catalog.replace_all(projects)
+    else:
+        # 向前多取一小段时间，避免遗漏与高水位时间相同的项目（重复写入无副作用）
+        since = datetime.fromisoformat(high_water.replace('Z', '+00:00')) - timedelta(seconds=CATALOG_SYNC_OVERLAP)
+        delta_params = {**params, "last_activity_after": since.isoformat(),
+                        "order_by": "last_activity_at", "sort": "asc"}
+        projects = list(client.paginate("/projects", params=delta_params))
+        catalog.upsert(projects)
+    
+    latest = max((p['last_activity_at'] for p in projects if p.get('last_activity_at')), default=None)
+    if latest and (not high_water or latest > high_water):
+        catalog.set_meta("last_activity_high_water", latest)
+    print(f"项目目录{'完整' if full else '增量'}同步完成：获取 {len(projects)} 个项目，共 {catalog.count()} 个项目")
+    return len(projects)
+
+def get_projects(save_automatically=False, full=False):
+    """同步本地项目目录并返回所有项目
+    
+    项目列表总是保存在本地项目目录中；save_automatically 为 True 时不打印项目列表。
+    """
     try:
         if not save_automatically:
-            print("\n正在获取项目列表...")
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            projects = response.json()
-            if not save_automatically:
-                print("\n项目列表：")
-                print("=" * 80)
-                print(f"{'ID':<8} {'项目名称':<30} {'命名空间':<20} {'最后活动时间':<20}")
-                print("-" * 80)
-                for project in projects:
-                    last_activity = project.get('last_activity_at', '未知')
-                    if last_activity != '未知':
-                        last_activity = last_activity.split('T')[0]  # 只显示日期部分
-                    print(f"{project['id']:<8} {project['name']:<30} {project['namespace']['name']:<20} {last_activity:<20}")
-                print("=" * 80)
-            
-            return projects, True
-        else:
-            print(f"获取项目列表失败: {response.text}")
-            return None, False
+            print("\n正在同步项目列表...")
+        sync_project_catalog(full)
+        projects = get_catalog().all()
+        if not save_automatically:
+            print("\n项目列表：")
+            print("=" * 80)
+            print(f"{'ID':<8} {'项目名称':<30} {'命名空间':<20} {'最后活动时间':<20}")
+            print("-" * 80)
+            for project in projects:
+                last_activity = project.get('last_activity_at') or '未知'
+                if last_activity != '未知':
+                    last_activity = last_activity.split('T')[0]  # 只显示日期部分
+                print(f"{project['id']:<8} {project['name']:<30} {project['namespace'] or '':<20} {last_activity:<20}")
+            print("=" * 80)
+        
+        return projects, True
     except Exception as e:
         print(f"获取项目列表时出错: {str(e)}")
         return None, False
 
 def start_export(project_id):
     """开始导出项目"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/export"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
-    response = requests.post(url, headers=headers)
+    response = get_client().start_export(project_id)
     if response.status_code == 202:
         print(f"项目 {project_id} 导出已开始")
         return True
@@ -54,47 +85,77 @@ def start_export(project_id):
 
 def check_export_status(project_id):
     """检查导出状态"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/export"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
-    response = requests.get(url, headers=headers)
+    response = get_client().check_export_status(project_id)
     if response.status_code == 200:
         data = response.json()
         return data.get("export_status")
     return None
 
-def download_export(project_id, project_info, output_dir):
-    """下载导出的项目"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/export/download"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
+def get_repository_size(project_id):
+    """获取项目的存储大小（字节），用于估算导出耗时；无权限或出错时返回 0"""
+    try:
+        response = get_client().get_project_details(project_id, params={"statistics": "true"})
+        if response.status_code == 200:
+            statistics = response.json().get("statistics") or {}
+            return statistics.get("storage_size") or statistics.get("repository_size") or 0
+    except Exception as e:
+        print(f"获取项目大小时出错: {str(e)}")
+    return 0
+
+def export_filepath(project_id, project_info, output_dir):
+    """项目导出归档的保存路径"""
+    return os.path.join(output_dir, f"{project_id}_{project_info['name']}.tar.gz")
+
+def has_partial_download(project_id, project_info, output_dir):
+    """是否有上次中断、可以续传的导出下载"""
+    return has_partial(export_filepath(project_id, project_info, output_dir))
+
+def download_export(project_id, project_info, output_dir, show_progress=True):
+    """下载导出的项目
+    
+    内容先写入 .part 文件；存在上次中断留下的 .part 时直接发起 Range 请求从断点继续
+    （If-Range 校验服务器上的文件未变化，变化时重新下载），服务器支持 Range 且文件较大时并行下载多个分段。
+    下载的同时校验 SHA-256 和 gzip/tar 结构，校验和写入 <归档>.sha256；
+    下载成功后记录到输出目录的备份清单中；启用去重存储时同时存入一个快照。
+    """
+    filepath = export_filepath(project_id, project_info, output_dir)
     
-    # 生成文件名
-    filename = f"{project_id}_{project_info['name']}.tar.gz"
-    filepath = os.path.join(output_dir, filename)
+    def open_response(headers):
+        return get_client().download_export(project_id, headers=headers)
     
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(url, headers=headers, stream=True)
-            if response.status_code == 200:
-                total_size = int(response.headers.get('content-length', 0))
-                
-                with open(filepath, 'wb') as f:
-                    with tqdm(total=total_size, unit='B', unit_scale=True, desc="下载进度") as pbar:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            if chunk:
-                                f.write(chunk)
-                                pbar.update(len(chunk))
-                
-                print(f"\n项目已成功导出到: {filepath}")
-                return True
-            elif response.status_code == 429:
-                if attempt < MAX_RETRIES - 1:
-                    print(f"请求过于频繁，等待 {RETRY_DELAY} 秒后重试...")
-                    time.sleep(RETRY_DELAY)
-                    continue
+            verifier = StreamVerifier()
+            if not resume_download(open_response, filepath, show_progress, verifier=verifier):
+                response = open_response({})
+                if response.status_code == 429:
+                    response.close()
+                    if attempt < MAX_RETRIES - 1:
+                        delay = retry_after(response) or RETRY_DELAY
+                        print(f"请求过于频繁，等待 {delay:.0f} 秒后重试...")
+                        time.sleep(delay)
+                        continue
+                    return False
+                if response.status_code != 200:
+                    print(f"下载失败: {response.text}")
+                    return False
+                verifier = StreamVerifier()
+                download_file(response, open_response, filepath, show_progress, verifier=verifier)
+            
+            checksum = verifier.result()['sha256']
+            write_sidecar(filepath, checksum)
+            snapshot_id = None
+            if STORE_ENABLED:
+                snapshot_id = store_archive(project_id, project_info, filepath)['id']
+                prune_snapshots(project_id)
+            record_backup(project_id, project_info, filepath, output_dir, snapshot_id, checksum)
+            if STORE_ENABLED and not STORE_KEEP_ARCHIVE:
+                os.remove(filepath)
+                os.remove(sidecar_path(filepath))
+                print(f"\n项目已成功导出到去重存储（快照 {snapshot_id}）")
             else:
-                print(f"下载失败: {response.text}")
-                return False
+                print(f"\n项目已成功导出到: {filepath}")
+            return True
         except Exception as e:
             print(f"下载出错: {str(e)}")
             if attempt < MAX_RETRIES - 1:
@@ -103,4 +164,4 @@ def download_export(project_id, project_info, output_dir):
                 continue
             return False
     
-    return False 
\ No newline at end of file
+    return False
@@ -0,0 +1,254 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+import requests
+from requests.adapters import HTTPAdapter
+from config import (GITLAB_URL, PRIVATE_TOKEN, HTTP_POOL_SIZE, HTTP_TIMEOUT, PAGE_WORKERS,
+                    CACHE_ENABLED, CACHE_PATH, CACHE_MAX_SIZE,
+                    RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_RATE, RATE_LIMIT_MIN_RATE, RATE_LIMIT_MAX_RETRIES)
+from http_cache import ResponseCache, is_immutable
+from rate_limiter import RateLimiter
+
+
+class GitLabClient:
+    """GitLab API 客户端
+
+    持有一个共享连接池的 requests.Session（长连接、gzip 压缩），
+    所有模块通过它访问 GitLab，避免每次请求都重新建立 TCP/TLS 连接。
+    各接口方法返回原始的 requests.Response，由调用方处理状态码。
+    传入 cache 时 GET 请求经过持久化响应缓存；
+    传入 limiter 时所有请求经过自适应限流，429 响应按 Retry-After 等待后自动重试。
+    """
+
+    def __init__(self, base_url=GITLAB_URL, private_token=PRIVATE_TOKEN,
+                 pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT, cache=None,
+                 limiter=None, max_retries=RATE_LIMIT_MAX_RETRIES):
+        self.base_url = base_url.rstrip('/')
+        self.api_url = f"{self.base_url}/api/v4"
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+        self.max_retries = max_retries
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "PRIVATE-TOKEN": private_token,
+            "Accept-Encoding": "gzip, deflate",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def url(self, path):
+        """将 API 路径转换为完整 URL"""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.api_url}{path}"
+
+    def request(self, method, path, **kwargs):
+        """发送请求"""
+        kwargs.setdefault("timeout", self.timeout)
+        if self.cache is not None and method == "GET" and not kwargs.get("stream"):
+            return self._cached_get(self.url(path), **kwargs)
+        return self._send(method, self.url(path), **kwargs)
+
+    def _send(self, method, url, **kwargs):
+        """经过限流器发送请求，被限流时等待后重试"""
+        if self.limiter is None:
+            return self.session.request(method, url, **kwargs)
+
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            response = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+            finally:
+                self.limiter.release(response)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            response.close()
+        return response
+
+    def _cached_get(self, url, params=None, headers=None, **kwargs):
+        """经过响应缓存的 GET 请求
+
+        不可变资源（以 SHA 定位的提交和差异）命中即返回，不访问网络；
+        其他资源携带 If-None-Match 重新验证，304 时返回缓存内容。
+        """
+        key = requests.Request("GET", url, params=params).prepare().url
+        cached = self.cache.get(key)
+        if cached and is_immutable(key):
+            self.cache.record("hits")
+            return cached[1]
+
+        headers = dict(headers or {})
+        if cached and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        response = self._send("GET", key, headers=headers, **kwargs)
+        if response.status_code == 304 and cached:
+            self.cache.record("revalidated")
+            return cached[1]
+
+        self.cache.record("misses")
+        if response.status_code == 200 and (is_immutable(key) or response.headers.get("ETag")):
+            self.cache.put(key, response)
+        return response
+
+    def get(self, path, params=None, **kwargs):
+        return self.request("GET", path, params=params, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def paginate(self, path, params=None, per_page=100, keyset=False, prefetch=False):
+        """遍历列表接口的所有分页，逐项惰性产出
+
+        使用 X-Next-Page，没有时（keyset 分页）跟随 Link: rel="next"（改写到配置的 GitLab 地址），不设页数上限。
+        keyset 为 True 时使用 GitLab 的 keyset 分页（按 id 升序），避免深分页变慢；
+        prefetch 为 True 时在调用方处理当前页的同时后台请求下一页。
+        请求失败时抛出 requests.HTTPError，已产出的数据不受影响。
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", per_page)
+        if keyset:
+            params.setdefault("pagination", "keyset")
+            params.setdefault("order_by", "id")
+            params.setdefault("sort", "asc")
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            response = self.get(path, params=params)
+            while True:
+                response.raise_for_status()
+                next_page = self._next_page(response, path, params)
+                future = None
+                if executor and next_page:
+                    future = executor.submit(self.get, *next_page)
+
+                yield from response.json()
+
+                if not next_page:
+                    break
+                response = future.result() if future else self.get(*next_page)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch_all_pages(self, path, params=None, per_page=100, max_workers=PAGE_WORKERS, keyset_fallback=False):
+        """并发获取列表接口的所有分页，按页序合并返回
+
+        先请求第一页并读取 X-Total-Pages，再用有界线程池并发请求剩余分页。
+        结果总数超过 GitLab 的统计上限时响应不含 X-Total-Pages，此时退回到顺序分页
+        （keyset_fallback 为 True 时改用 keyset 分页重新遍历）。
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", per_page)
+
+        first = self.get(path, params={**params, "page": 1})
+        first.raise_for_status()
+        items = first.json()
+
+        total_pages = first.headers.get("X-Total-Pages")
+        if not total_pages:
+            if keyset_fallback:
+                return list(self.paginate(path, params=params, keyset=True, prefetch=True))
+            next_page = self._next_page(first, path, params)
+            if next_page:
+                items.extend(self.paginate(*next_page, prefetch=True))
+            return items
+
+        def fetch_page(page):
+            response = self.get(path, params={**params, "page": page})
+            response.raise_for_status()
+            return response.json()
+
+        pages = range(2, int(total_pages) + 1)
+        if pages:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for page_items in executor.map(fetch_page, pages):
+                    items.extend(page_items)
+        return items
+
+    def _next_page(self, response, path, params):
+        """从响应头中解析下一页请求，返回 (path, params) 或 None
+
+        偏移分页使用 X-Next-Page；keyset 分页只有 Link: rel="next"，其中的主机来自 GitLab 的 external_url，
+        可能与配置的地址不同（例如经过代理），因此只取 /api/v4 之后的路径和查询参数，重新拼到 base_url 上，
+        令牌不会发往其他主机。
+        """
+        next_page = response.headers.get("X-Next-Page")
+        if next_page:
+            return path, {**params, "page": next_page}
+        next_url = response.links.get("next", {}).get("url")
+        if not next_url:
+            return None
+        link = urlsplit(next_url)
+        _, separator, api_path = link.path.partition("/api/v4/")
+        if not separator:
+            raise requests.HTTPError(f"无法识别的下一页链接: {next_url}", response=response)
+        return f"/{api_path}", parse_qsl(link.query, keep_blank_values=True)
+
+    # 项目与导出
+    def get_projects(self, params=None):
+        return self.get("/projects", params=params)
+
+    def get_project_details(self, project_id, params=None):
+        return self.get(f"/projects/{project_id}", params=params)
+
+    def start_export(self, project_id):
+        return self.post(f"/projects/{project_id}/export")
+
+    def check_export_status(self, project_id):
+        return self.get(f"/projects/{project_id}/export")
+
+    def download_export(self, project_id, headers=None):
+        # 不压缩传输，保证 Range 偏移对应文件本身的字节
+        headers = {"Accept-Encoding": "identity", **(headers or {})}
+        return self.get(f"/projects/{project_id}/export/download", headers=headers, stream=True)
+
+    # 用户
+    def get_user_info(self, user_id):
+        return self.get(f"/users/{user_id}")
+
+    def get_current_user(self):
+        return self.get("/user")
+
+    def get_all_users(self, params=None):
+        return self.get("/users", params=params)
+
+    def get_user_events(self, user_id, params=None):
+        return self.get(f"/users/{user_id}/events", params=params)
+
+    # 提交
+    def get_project_commits(self, project_id, params=None):
+        return self.get(f"/projects/{project_id}/repository/commits", params=params)
+
+    def get_commit_details(self, project_id, commit_sha):
+        return self.get(f"/projects/{project_id}/repository/commits/{commit_sha}")
+
+    def get_commit_diff(self, project_id, commit_sha):
+        return self.get(f"/projects/{project_id}/repository/commits/{commit_sha}/diff")
+
+    def compare(self, project_id, commit_from, commit_to):
+        return self.get(f"/projects/{project_id}/repository/compare",
+                        params={"from": commit_from, "to": commit_to})
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """获取全局共享的 GitLab 客户端"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                cache = ResponseCache(CACHE_PATH, CACHE_MAX_SIZE) if CACHE_ENABLED else None
+                limiter = (RateLimiter(RATE_LIMIT_MAX_RATE, RATE_LIMIT_MIN_RATE, HTTP_POOL_SIZE)
+                           if RATE_LIMIT_ENABLED else None)
+                _client = GitLabClient(cache=cache, limiter=limiter)
+    return _client
@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# 以完整 SHA 定位的提交详情和差异是不可变的，命中缓存后无需访问网络
+IMMUTABLE_PATTERN = re.compile(r"/repository/commits/([0-9a-f]{40}|[0-9a-f]{64})(/diff)?(\?|$)")
+
+# 缓存的是解码后的正文，这些响应头不再适用
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def is_immutable(url):
+    """判断 URL 对应的资源是否不可变"""
+    return bool(IMMUTABLE_PATTERN.search(url))
+
+
+class ResponseCache:
+    """基于 SQLite 的持久化 HTTP 响应缓存
+
+    以完整 URL 为键保存 200 响应。不可变资源直接返回缓存，
+    其他资源通过 ETag/If-None-Match 条件请求重新验证。
+    超过 max_size 字节时按最近访问时间淘汰（LRU）。
+    """
+
+    def __init__(self, path, max_size):
+        self.path = path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        """读取缓存条目，返回 (etag, response) 或 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, headers, body FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+        etag, headers, body = row
+        return etag, self._build_response(url, json.loads(headers), body)
+
+    def put(self, url, response):
+        """保存 200 响应"""
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS}
+        body = response.content
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, headers, body, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, response.headers.get("ETag"), json.dumps(headers), body, len(body), time.time()))
+            self._total_size += len(body) - (old[0] if old else 0)
+            if self._total_size > self.max_size:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """按最近访问时间淘汰条目，直到总大小降到上限的 90% 以下"""
+        target = self.max_size * 0.9
+        rows = self._conn.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if self._total_size <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._total_size -= size
+
+    @staticmethod
+    def _build_response(url, headers, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.encoding = "utf-8"
+        return response
+
+    def record(self, name):
+        """累加命中统计（hits/misses/revalidated）"""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """返回命中统计"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "size": self._total_size,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_size = 0
@@ -0,0 +1,89 @@
+import time
+import threading
+from collections import OrderedDict
+from config import MEMO_TTL, MEMO_MAX_ENTRIES
+
+
+class _Pending:
+    """正在进行的查询，等待的调用方共享其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class TTLCache:
+    """进程内的查询结果缓存
+
+    条目在 ttl 秒后过期，超过 max_entries 时淘汰最久未使用的条目。
+    同一个键的并发查询只发出一次请求，其余调用方等待并共享结果；
+    返回 None 的查询（失败或不存在）只与正在等待的调用方共享，不缓存。
+    返回的对象为共享对象，调用方不应修改。
+    """
+
+    def __init__(self, ttl=MEMO_TTL, max_entries=MEMO_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (过期时间, 值)
+        self._inflight = {}             # key -> _Pending
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = _Pending()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            pending.done.wait()
+            return pending.value
+
+        try:
+            pending.value = loader()
+            if pending.value is not None:
+                with self._lock:
+                    self._entries[key] = (time.monotonic() + self.ttl, pending.value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            return pending.value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            pending.done.set()
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "shared": self.shared, "entries": len(self._entries)}
+
+
+users = TTLCache()
+projects = TTLCache()
+current_user = TTLCache()
+
+
+def memo_stats():
+    """所有进程内缓存的合计统计"""
+    total = {"hits": 0, "misses": 0, "shared": 0, "entries": 0}
+    for cache in (users, projects, current_user):
+        for key, value in cache.stats().items():
+            total[key] += value
+    return total
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+仓库镜像备份模块
+
+@Description: 备份仓库时不再让 GitLab 生成导出归档，而是增量 fetch 本地裸镜像，
+              并为每次备份生成相对上一次快照的增量 git bundle（只包含新增对象）；
+              可按顺序应用 bundle 还原出完整的裸仓库
+"""
+
+import os
+import json
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from config import BUNDLE_PATH, BUNDLE_FULL_EVERY, MIRROR_PATH, MIRROR_WORKERS
+from git_mirror import run_git, sync_mirror
+
+INDEX_FILE = 'index.json'
+
+
+def _project_dir(bundle_root, project_id):
+    return os.path.join(bundle_root, str(project_id))
+
+
+def load_index(project_id, bundle_root=BUNDLE_PATH):
+    """读取项目的 bundle 索引，不存在或损坏时返回空索引"""
+    try:
+        with open(os.path.join(_project_dir(bundle_root, project_id), INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        index.setdefault('bundles', [])
+        return index
+    except (OSError, ValueError):
+        return {'project_id': project_id, 'bundles': []}
+
+
+def _save_index(project_id, index, bundle_root):
+    path = os.path.join(_project_dir(bundle_root, project_id), INDEX_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def list_refs(git_dir):
+    """返回仓库的分支和标签 {引用名: 对象ID}"""
+    output = run_git(['for-each-ref', '--format=%(objectname) %(refname)', 'refs/heads', 'refs/tags'],
+                     git_dir=git_dir).stdout
+    return dict(reversed(line.split(' ', 1)) for line in output.splitlines())
+
+
+def _existing_objects(git_dir, object_ids):
+    """筛选仍存在于镜像中的对象（强制推送后旧的提交可能已被清理）"""
+    if not object_ids:
+        return []
+    output = run_git(['cat-file', '--batch-check=%(objectname) %(objecttype)'], git_dir=git_dir,
+                     input=''.join(f"{object_id}\n" for object_id in object_ids)).stdout
+    return [line.split()[0] for line in output.splitlines() if not line.endswith(' missing')]
+
+
+def backup_repository(project, bundle_root=BUNDLE_PATH, mirror_root=MIRROR_PATH, full=False):
+    """增量备份一个项目的仓库，返回本次的 bundle 记录（无变化时返回上一次的记录），失败时返回 None
+
+    在上一次记录的引用基础上生成增量 bundle；首次备份、full 为 True
+    或自上次完整 bundle 以来已有 BUNDLE_FULL_EVERY 个增量时生成完整 bundle。
+    """
+    mirror = sync_mirror(project, mirror_root)
+    if mirror is None:
+        return None
+
+    project_id = project['id']
+    project_dir = _project_dir(bundle_root, project_id)
+    try:
+        refs = list_refs(mirror)
+        index = load_index(project_id, bundle_root)
+        last = index['bundles'][-1] if index['bundles'] else None
+        if last and last['refs'] == refs and not full:
+            print(f"项目 {project['name']} 的仓库无变化")
+            return last
+
+        chain = 0
+        for entry in reversed(index['bundles']):
+            if entry['full']:
+                break
+            chain += 1
+        incremental = bool(last) and not full and chain < BUNDLE_FULL_EVERY
+
+        entry = {
+            'id': datetime.now().strftime('%Y%m%dT%H%M%S'),
+            'created_at': datetime.now().isoformat(),
+            'full': not incremental,
+            'refs': refs,
+            'bundle': None,
+            'size': 0
+        }
+        os.makedirs(project_dir, exist_ok=True)
+        base_id, suffix = entry['id'], 1
+        while any(existing['id'] == entry['id'] for existing in index['bundles']):
+            entry['id'] = f"{base_id}-{suffix}"
+            suffix += 1
+
+        if refs:
+            # 上一次备份的引用作为前置条件，只打包新增的对象
+            prerequisites = []
+            if incremental:
+                prerequisites = [f"^{object_id}" for object_id in _existing_objects(mirror, list(last['refs'].values()))]
+            bundle_file = os.path.join(project_dir, f"{entry['id']}.bundle")
+            tmp_file = f"{bundle_file}.tmp"
+            try:
+                run_git(['bundle', 'create', '--quiet', os.path.abspath(tmp_file), '--branches', '--tags', '--stdin'],
+                        git_dir=mirror, input=''.join(f"{revision}\n" for revision in prerequisites))
+            except subprocess.CalledProcessError as e:
+                # 只删除或移动了引用、没有新对象时 git 拒绝生成空 bundle，只记录引用
+                if 'empty bundle' not in e.stderr:
+                    raise
+            else:
+                run_git(['bundle', 'verify', '--quiet', os.path.abspath(tmp_file)], git_dir=mirror)
+                os.replace(tmp_file, bundle_file)
+                entry['bundle'] = os.path.basename(bundle_file)
+                entry['size'] = os.path.getsize(bundle_file)
+
+        index['project_id'] = project_id
+        index['name'] = project.get('name')
+        index['bundles'].append(entry)
+        _save_index(project_id, index, bundle_root)
+    except subprocess.CalledProcessError as e:
+        print(f"备份项目 {project['name']} 的仓库失败: {e.stderr.strip()}")
+        return None
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"备份项目 {project['name']} 的仓库失败: {str(e)}")
+        return None
+
+    kind = '完整' if entry['full'] else '增量'
+    print(f"项目 {project['name']} 的仓库已备份：{kind} bundle {entry['size'] / 1024 / 1024:.1f} MB")
+    return entry
+
+
+def backup_repositories(projects=None, bundle_root=BUNDLE_PATH, workers=MIRROR_WORKERS, full=False):
+    """用有界线程池并行备份多个项目的仓库，返回 {项目ID: 是否成功}
+
+    未指定项目时先同步项目目录并备份全部项目；获取项目列表失败时返回 None。
+    """
+    if projects is None:
+        from gitlab_api import get_projects
+        print("\n正在同步项目列表...")
+        projects, success = get_projects(save_automatically=True)
+        if not success:
+            return None
+
+    print(f"正在备份 {len(projects)} 个项目的仓库（并行数: {workers}）...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(lambda project: backup_repository(project, bundle_root, full=full), projects))
+
+    results = {project['id']: entry is not None for project, entry in zip(projects, entries)}
+    total_size = sum(entry['size'] for entry in entries if entry)
+    print(f"\n仓库备份完成：成功 {sum(results.values())} 个，失败 {len(results) - sum(results.values())} 个，"
+          f"本次新增 bundle {total_size / 1024 / 1024:.1f} MB")
+    return results
+
+
+def restore_repository(project_id, target, bundle_root=BUNDLE_PATH):
+    """按顺序应用项目的 bundle，还原出最近一次备份时的裸仓库"""
+    index = load_index(project_id, bundle_root)
+    if not index['bundles']:
+        raise ValueError(f"没有项目 {project_id} 的仓库备份")
+    start = max(i for i, entry in enumerate(index['bundles']) if entry['full'])
+    chain = index['bundles'][start:]
+
+    run_git(['init', '--quiet', '--bare', target])
+    for entry in chain:
+        if entry['bundle']:
+            bundle_file = os.path.abspath(os.path.join(_project_dir(bundle_root, project_id), entry['bundle']))
+            # 强制推送后的引用不是快进，需要强制更新
+            run_git(['fetch', '--quiet', bundle_file, '+refs/*:refs/*'], git_dir=target)
+
+    # 引用以最近一次备份为准（包括之后被删除的分支和标签）
+    refs = chain[-1]['refs']
+    for ref in list_refs(target):
+        if ref not in refs:
+            run_git(['update-ref', '-d', ref], git_dir=target)
+    for ref, object_id in refs.items():
+        run_git(['update-ref', ref, object_id], git_dir=target)
+    return target
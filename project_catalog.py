@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from config import GITLAB_URL
+
+CATALOG_DIR = "projects"
+
+_COLUMNS = ("id", "name", "path", "path_with_namespace", "namespace", "last_activity_at")
+
+
+def catalog_path(gitlab_url=GITLAB_URL):
+    """项目目录数据库的位置（按 GitLab 域名区分）"""
+    domain = gitlab_url.split('://')[1].rstrip('/').replace(':', '_')
+    return os.path.join(CATALOG_DIR, f"{domain}.sqlite3")
+
+
+def project_row(project):
+    """将 API 返回的项目（或已保存的项目字典）转换为目录记录"""
+    namespace = project.get("namespace")
+    if isinstance(namespace, dict):
+        namespace = namespace.get("name")
+    return {
+        "id": project["id"],
+        "name": project["name"],
+        "path": project.get("path"),
+        "path_with_namespace": project.get("path_with_namespace"),
+        "namespace": namespace,
+        "last_activity_at": project.get("last_activity_at"),
+    }
+
+
+class ProjectCatalog:
+    """基于 SQLite 的本地项目目录
+
+    按项目 ID（主键）、完整路径和命名空间建立索引，查询无需加载全部项目；
+    meta 表记录最近一次同步、最近一次完整同步的时间和已同步的最大 last_activity_at。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS projects (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                path TEXT,
+                path_with_namespace TEXT,
+                namespace TEXT,
+                last_activity_at TEXT,
+                synced_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_projects_path ON projects (path_with_namespace);
+            CREATE INDEX IF NOT EXISTS idx_projects_namespace ON projects (namespace);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def upsert(self, projects, synced_at=None):
+        """插入或更新项目，返回写入的数量"""
+        synced_at = synced_at or datetime.now().isoformat()
+        rows = [{**project_row(project), "synced_at": synced_at} for project in projects]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO projects (id, name, path, path_with_namespace, namespace, "
+                "last_activity_at, synced_at) VALUES (:id, :name, :path, :path_with_namespace, "
+                ":namespace, :last_activity_at, :synced_at)", rows)
+            self._set_meta("last_sync", synced_at)
+            self._conn.commit()
+        return len(rows)
+
+    def replace_all(self, projects):
+        """用完整的项目列表替换目录（删除已不存在的项目）"""
+        synced_at = datetime.now().isoformat()
+        count = self.upsert(projects, synced_at)
+        with self._lock:
+            self._conn.execute("DELETE FROM projects WHERE synced_at != ?", (synced_at,))
+            self._set_meta("last_full_sync", synced_at)
+            self._conn.commit()
+        return count
+
+    def _set_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._set_meta(key, value)
+            self._conn.commit()
+
+    def get_meta(self, key):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def get(self, project_id):
+        rows = self._query(f"SELECT {', '.join(_COLUMNS)} FROM projects WHERE id = ?", (project_id,))
+        return rows[0] if rows else None
+
+    def find_by_path(self, path_with_namespace):
+        rows = self._query(f"SELECT {', '.join(_COLUMNS)} FROM projects WHERE path_with_namespace = ?",
+                           (path_with_namespace,))
+        return rows[0] if rows else None
+
+    def list_by_namespace(self, namespace):
+        return self._query(f"SELECT {', '.join(_COLUMNS)} FROM projects WHERE namespace = ? ORDER BY id",
+                           (namespace,))
+
+    def all(self):
+        return self._query(f"SELECT {', '.join(_COLUMNS)} FROM projects ORDER BY id")
+
+    def ids(self):
+        return [row["id"] for row in self._query("SELECT id FROM projects ORDER BY id")]
+
+    def count(self):
+        return self._query("SELECT COUNT(*) AS n FROM projects")[0]["n"]
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """获取当前 GitLab 实例的项目目录"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ProjectCatalog(catalog_path())
+    return _catalog
@@ -0,0 +1,129 @@
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+# 没有 Retry-After/RateLimit-Reset 时，连续被限流的退避上限（秒）
+MAX_BACKOFF = 60
+
+
+def _header_number(response, name):
+    try:
+        return float(response.headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retry_after(response):
+    """从 Retry-After 或 RateLimit-Reset 响应头解析需要等待的秒数，没有时返回 None"""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return reset_in(response)
+
+
+def reset_in(response):
+    """距离配额重置的秒数（GitLab 的 RateLimit-Reset 为 Unix 时间戳，也兼容相对秒数）"""
+    reset = _header_number(response, "RateLimit-Reset")
+    if reset is None:
+        return None
+    if reset > 1e9:
+        reset -= time.time()
+    return max(0.0, reset)
+
+
+class RateLimiter:
+    """自适应限流器
+
+    令牌桶控制请求速率，并发窗口控制同时进行的请求数，两者都按 AIMD 调整：
+    成功时加性增长，被限流（429）时减半，并暂停所有请求直到 Retry-After 指定的时间。
+    响应中的 RateLimit-Remaining/RateLimit-Reset 表明配额即将用完时，
+    把剩余配额均匀分布到重置之前，避免被限流。
+    """
+
+    def __init__(self, max_rate, min_rate, max_concurrency):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.max_concurrency = max_concurrency
+        self.rate = max_rate
+        self.concurrency = float(max_concurrency)
+        self.throttled = 0
+
+        self._cond = threading.Condition()
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._consecutive_429 = 0
+
+    def acquire(self):
+        """等待直到允许发送下一个请求"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    timeout = self._paused_until - now
+                elif self._in_flight >= int(self.concurrency):
+                    timeout = None
+                elif self._tokens < 1:
+                    timeout = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    return
+                self._cond.wait(timeout)
+
+    def release(self, response=None):
+        """请求结束（或收到响应头）后归还并发槽位，并根据响应调整速率"""
+        with self._cond:
+            self._in_flight -= 1
+            if response is not None:
+                self._observe(response)
+            self._cond.notify_all()
+
+    def _refill(self, now):
+        burst = max(1.0, self.concurrency)
+        self._tokens = min(burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _observe(self, response):
+        now = time.monotonic()
+        if response.status_code == 429:
+            # 乘性减小，并在服务器要求的时间内暂停
+            self.throttled += 1
+            self._consecutive_429 += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.concurrency = max(1.0, self.concurrency / 2)
+            wait = retry_after(response)
+            if wait is None:
+                wait = min(MAX_BACKOFF, 2 ** self._consecutive_429)
+            self._paused_until = max(self._paused_until, now + wait)
+            self._tokens = 0.0
+            return
+
+        self._consecutive_429 = 0
+        remaining = _header_number(response, "RateLimit-Remaining")
+        reset = reset_in(response)
+        if remaining is not None and reset and remaining / reset < self.rate:
+            # 按当前速率会在重置前耗尽配额
+            self.rate = max(self.min_rate, remaining / reset)
+            if remaining < 1:
+                self._paused_until = max(self._paused_until, now + reset)
+        else:
+            # 加性增长：每个窗口的请求全部成功后，速率和并发数大约各加一
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "concurrency": int(self.concurrency),
+                "throttled": self.throttled,
+            }
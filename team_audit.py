@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+团队提交审计模块
+
+@Description: 一次遍历每个项目的提交历史，按作者/提交者邮箱把提交分给多个用户，
+              为每个用户分别生成报告；耗时随提交数量增长，而不是随 用户数 × 项目数 增长
+"""
+
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from config import OUTPUT_DIR, FETCH_CONCURRENCY, MIRROR_ENABLED
+from file_operations import load_projects_file, clean_filename
+from user_commits import get_user_info, get_project_commits, complete_commit_detail
+
+
+def _match_users(commit, users_by_email):
+    """返回提交的作者或提交者对应的用户ID（去重、保持顺序）"""
+    matched = []
+    for field in ('author_email', 'committer_email'):
+        user_id = users_by_email.get((commit.get(field) or '').lower())
+        if user_id is not None and user_id not in matched:
+            matched.append(user_id)
+    return matched
+
+
+def export_team_commits(user_ids, format_types, since=None, until=None, output_dir=OUTPUT_DIR,
+                        concurrency=FETCH_CONCURRENCY):
+    """为多个用户导出提交记录报告
+
+    每个项目的提交列表只获取一次，按邮箱分给各个用户；列表中字段齐全的提交不再获取详情，
+    需要获取的详情或差异也只为每个提交获取一次。
+    报告写入 output_dir 下的 team_audit_<时间戳> 目录，每个用户每种格式一个文件。
+    返回 {用户ID: 提交数}，失败时返回 None。
+    """
+    from commit_writers import WRITERS, needs_diff, required_fields
+
+    unknown = [format_type for format_type in format_types if format_type not in WRITERS]
+    if unknown:
+        print(f"不支持的导出格式: {', '.join(unknown)}")
+        return None
+
+    users = {}
+    users_by_email = {}
+    for user_id in user_ids:
+        user_info = get_user_info(user_id)
+        if not user_info:
+            print(f"无法获取用户 {user_id} 的信息，已跳过")
+            continue
+        if not user_info.get('email'):
+            print(f"用户 {user_info['username']} 没有可见的邮箱，无法匹配提交，已跳过")
+            continue
+        users[user_id] = user_info
+        users_by_email[user_info['email'].lower()] = user_id
+    if not users:
+        print("没有可审计的用户")
+        return None
+
+    projects_data = load_projects_file()
+    if not projects_data:
+        print("无法加载项目列表")
+        return None
+    projects = projects_data['projects']
+
+    audit_dir = os.path.join(output_dir, f"team_audit_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    os.makedirs(audit_dir, exist_ok=True)
+
+    with_diff = needs_diff(format_types)
+    fields = required_fields(format_types)
+    writers = {}
+    counts = {user_id: 0 for user_id in users}
+    success = True
+    try:
+        for user_id, user_info in users.items():
+            info = {
+                "user_id": user_id,
+                "user_info": user_info,
+                "since": since,
+                "until": until,
+                "projects_scanned": len(projects),
+                "export_type": "team_audit"
+            }
+            base_name = f"user_{user_id}_{clean_filename(user_info['username'])}"
+            writers[user_id] = [WRITERS[format_type](os.path.join(audit_dir, f"{base_name}.{format_type}"), info)
+                                for format_type in format_types]
+
+        print(f"正在审计 {len(users)} 个用户在 {len(projects)} 个项目中的提交记录...")
+        if MIRROR_ENABLED:
+            from git_mirror import iter_mirrors, log_commits
+            mirrored = iter_mirrors(projects)
+        else:
+            mirrored = ((project, None) for project in projects)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for project, mirror in mirrored:
+                project_id = project['id']
+                print(f"正在处理项目: {project['name']} (ID: {project_id}){' [本地镜像]' if mirror else ''}")
+
+                # 每个项目只获取一次提交列表，按邮箱分给各个用户
+                if mirror:
+                    commits = log_commits(mirror, project, since=since, until=until)
+                else:
+                    commits = get_project_commits(project_id, since=since, until=until,
+                                                  with_stats='stats' in fields)
+                shas_by_user = {}
+                matched = {}
+                for commit in commits:
+                    for user_id in _match_users(commit, users_by_email):
+                        shas_by_user.setdefault(user_id, []).append(commit['id'])
+                        matched[commit['id']] = commit
+                if not shas_by_user:
+                    continue
+
+                details = dict(zip(matched, pool.map(
+                    lambda commit: complete_commit_detail(project_id, commit['id'], commit, fields, with_diff, mirror),
+                    matched.values())))
+
+                for user_id, user_shas in shas_by_user.items():
+                    for writer in writers[user_id]:
+                        writer.begin_project(project, len(user_shas))
+                    written = 0
+                    for sha in user_shas:
+                        if details[sha]:
+                            for writer in writers[user_id]:
+                                writer.write_commit(project, details[sha])
+                            written += 1
+                    for writer in writers[user_id]:
+                        writer.end_project(project, written)
+                    counts[user_id] += written
+                summary = ', '.join(f"{users[uid]['username']}: {len(user_shas)}" for uid, user_shas in shas_by_user.items())
+                print(f"  找到提交 {summary}")
+    except Exception as e:
+        print(f"团队审计时出错: {str(e)}")
+        success = False
+    finally:
+        for user_writers in writers.values():
+            for writer in user_writers:
+                if not writer.close():
+                    success = False
+
+    print(f"\n团队审计报告已保存到: {audit_dir}")
+    for user_id, count in counts.items():
+        print(f"  {users[user_id]['name']} ({users[user_id]['username']}): {count} 个提交")
+    return counts if success else None
@@ -1,9 +1,10 @@
-import time
 from datetime import datetime
 from tqdm import tqdm
-from gitlab_api import start_export, check_export_status, download_export
-from file_operations import ensure_output_dir, get_project_info, load_projects_file, save_projects_to_file
-from config import OUTPUT_DIR
+from gitlab_api import start_export, check_export_status, download_export, get_repository_size, has_partial_download
+from export_watcher import ExportWatcher
+from file_operations import ensure_output_dir, get_project_info, load_projects_file
+from config import OUTPUT_DIR, STORE_ENABLED
+from utils import ask_time_range
 import os
 
 def show_menu():
@@ -16,18 +17,19 @@ def show_menu():
     print("3. 导出用户提交记录")
     print("4. 快速导出当前用户提交记录")
     print("5. 快速导出指定用户ID提交记录")
+    print("6. 批量导出项目")
+    print("7. 团队提交审计（多用户）")
     print("0. 退出")
     print("=" * 50)
-    choice = input("\n请选择功能 (0-5): ")
+    choice = input("\n请选择功能 (0-7): ")
     return choice
 
 def handle_menu_choice(choice):
     """处理菜单选择"""
     if choice == "1":
         from gitlab_api import get_projects
-        projects, success = get_projects()
-        if success and input("\n是否将项目列表保存到本地文件？(y/n): ").lower() == 'y':
-            save_projects_to_file(projects)
+        full = input("\n是否完整刷新项目列表（同时清理已删除的项目）？(y/n，默认只同步有变化的项目): ").lower() == 'y'
+        get_projects(full=full)
     elif choice == "2":
         project_id = select_project()
         if project_id:
@@ -40,10 +42,18 @@ def handle_menu_choice(choice):
                 print("请输入有效的项目ID（数字）")
     elif choice == "3":
         handle_user_commits_export()
+        print_cache_stats()
     elif choice == "4":
         handle_quick_export_current_user()
+        print_cache_stats()
     elif choice == "5":
         handle_quick_export_user_by_id()
+        print_cache_stats()
+    elif choice == "6":
+        handle_batch_export()
+    elif choice == "7":
+        handle_team_audit()
+        print_cache_stats()
     elif choice == "0":
         print("退出程序")
         return False
@@ -51,6 +61,23 @@ def handle_menu_choice(choice):
         print("无效的选择，请重新输入")
     return True
 
+def print_cache_stats():
+    """显示响应缓存的命中统计和限流情况"""
+    from gitlab_client import get_client
+    client = get_client()
+    if client.cache is not None:
+        stats = client.cache.stats()
+        print(f"缓存统计: 命中 {stats['hits']} 次，重新验证 {stats['revalidated']} 次，"
+              f"未命中 {stats['misses']} 次，缓存大小 {stats['size'] / 1024 / 1024:.1f} MB")
+    from memo import memo_stats
+    stats = memo_stats()
+    if stats['hits'] or stats['shared']:
+        print(f"进程内缓存: 命中 {stats['hits']} 次，合并并发查询 {stats['shared']} 次，请求 {stats['misses']} 次")
+    if client.limiter is not None and client.limiter.throttled:
+        stats = client.limiter.stats()
+        print(f"限流统计: 被限流 {stats['throttled']} 次，当前速率 {stats['rate']:.1f} 次/秒，"
+              f"并发 {stats['concurrency']}")
+
 def select_project():
     """从项目列表中选择项目"""
     data = load_projects_file()
@@ -60,8 +87,6 @@ def select_project():
         projects, success = get_projects(save_automatically=True)
         if not success:
             return None
-        from file_operations import save_projects_to_file
-        save_projects_to_file(projects)
         data = load_projects_file()
         if not data:
             return None
@@ -73,10 +98,10 @@ def select_project():
     print("-" * 80)
     
     for project in projects:
-        last_activity = project.get('last_activity_at', '未知')
+        last_activity = project.get('last_activity_at') or '未知'
         if last_activity != '未知':
             last_activity = last_activity.split('T')[0]  # 只显示日期部分
-        print(f"{project['id']:<8} {project['name']:<30} {project['namespace']:<20} {last_activity:<20}")
+        print(f"{project['id']:<8} {project['name']:<30} {project['namespace'] or '':<20} {last_activity:<20}")
     print("=" * 80)
     
     while True:
@@ -87,7 +112,7 @@ def select_project():
                 
             project_id = int(project_id)
             # 验证项目ID是否存在
-            if any(project['id'] == project_id for project in projects):
+            if get_project_info(project_id):
                 return project_id
             else:
                 print("无效的项目ID，请重新输入")
@@ -95,50 +120,212 @@ def select_project():
             print("请输入有效的项目ID（数字）")
 
 def export_project(project_id):
-    """导出项目的完整流程"""
+    """导出项目的完整流程
+    
+    服务器上已有完成的导出时可以直接下载（有上次中断的下载时从断点继续），不重新触发导出。
+    """
     ensure_output_dir()
     
-    if not start_export(project_id):
+    project_info = get_project_info(project_id)
+    if not project_info:
+        print("无法获取项目信息")
         return False
     
-    print("\n正在等待导出完成...")
-    with tqdm(total=100, desc="导出进度") as pbar:
-        while True:
-            status = check_export_status(project_id)
+    reuse = False
+    if check_export_status(project_id) == "finished":
+        partial = has_partial_download(project_id, project_info, OUTPUT_DIR)
+        hint = "，上次的下载未完成，可从断点继续" if partial else ""
+        answer = input(f"\n服务器上已有完成的导出{hint}。是否直接下载而不重新导出？(y/n，默认 y): ").strip().lower()
+        reuse = answer != 'n'
+    
+    if not reuse:
+        repository_size = get_repository_size(project_id)
+        if not start_export(project_id):
+            return False
+        
+        print("\n正在等待导出完成...")
+        watcher = ExportWatcher()
+        watcher.add(project_id, repository_size)
+        with tqdm(total=100, desc="导出进度") as pbar:
+            status = watcher.wait(project_id, check_export_status, pbar)
             if status == "finished":
                 pbar.update(100 - pbar.n)
-                break
-            elif status == "failed":
-                print("\n导出失败")
-                return False
-            elif status == "none":
-                print("\n项目未找到或无权访问")
-                return False
-            
-            # 更新进度条（假设导出过程大约需要30秒）
-            if pbar.n < 90:  # 保留10%给最后的完成状态
-                pbar.update(1)
-            time.sleep(0.3)  # 更频繁地更新进度条
+        
+        if status == "failed":
+            print("\n导出失败")
+            return False
+        elif status == "none":
+            print("\n项目未找到或无权访问")
+            return False
+        print(f"导出完成（状态查询 {watcher.polls} 次）")
     
-    project_info = get_project_info(project_id)
-    if not project_info:
-        print("无法获取项目信息")
+    success = download_export(project_id, project_info, OUTPUT_DIR)
+    if STORE_ENABLED:
+        from archive_store import collect_garbage
+        collect_garbage()
+    
+    return success
+
+def handle_batch_export():
+    """处理批量导出项目"""
+    data = load_projects_file()
+    if not data:
+        print("\n正在自动获取项目列表...")
+        from gitlab_api import get_projects
+        projects, success = get_projects(save_automatically=True)
+        if not success:
+            print("无法获取项目列表，请先使用功能1查询项目列表")
+            return
+        data = load_projects_file()
+        if not data:
+            return
+
+    all_ids = [project['id'] for project in data['projects']]
+    print(f"\n项目列表中共有 {len(all_ids)} 个项目")
+    user_input = input("请输入要导出的项目ID（逗号分隔，输入all导出全部，输入changed只导出有变化的项目，输入0返回): ").strip()
+    if user_input == '0' or not user_input:
+        return
+
+    if user_input.lower() == 'changed':
+        from batch_export import export_changed_projects
+        results = export_changed_projects()
+        if results:
+            failed = [pid for pid, ok in results.items() if not ok]
+            if failed:
+                print(f"导出失败的项目: {', '.join(map(str, failed))}")
+        return
+
+    if user_input.lower() == 'all':
+        project_ids = all_ids
+    else:
+        try:
+            project_ids = [int(part) for part in user_input.replace('，', ',').split(',') if part.strip()]
+        except ValueError:
+            print("请输入有效的项目ID（数字）")
+            return
+        invalid = [pid for pid in project_ids if pid not in all_ids]
+        if invalid:
+            print(f"以下项目ID无效，已忽略: {', '.join(map(str, invalid))}")
+            project_ids = [pid for pid in project_ids if pid in all_ids]
+
+    if not project_ids:
+        print("没有可导出的项目")
+        return
+
+    reuse_finished = input("服务器上已完成的导出是否直接下载而不重新导出？(y/n，默认 n，未完成的下载总会续传): ").strip().lower() == 'y'
+
+    from batch_export import export_projects_batch
+    results = export_projects_batch(project_ids, reuse_finished=reuse_finished)
+    failed = [pid for pid, ok in results.items() if not ok]
+    if failed:
+        print(f"导出失败的项目: {', '.join(map(str, failed))}")
+
+def ask_resume(kind, user_id, since, until, formats):
+    """存在相同参数的未完成导出时，询问是否从检查点继续"""
+    from checkpoint import has_checkpoint
+    if not has_checkpoint(kind, user_id, since, until, formats):
         return False
+    return input("\n发现该用户未完成的导出，是否从检查点继续？(y/n): ").lower() == 'y'
+
+def resume_last_export():
+    """从最近的检查点继续未完成的提交记录导出"""
+    from checkpoint import list_checkpoints
     
-    success = download_export(project_id, project_info, OUTPUT_DIR)
+    checkpoints = list_checkpoints()
+    if not checkpoints:
+        print("没有未完成的导出")
+        return False
+    
+    meta = checkpoints[0]
+    print(f"继续导出用户 {meta['user_id']} 的提交记录（开始于 {meta['started_at']}）")
+    ensure_output_dir()
+    
+    if meta['kind'] == 'user_commits':
+        from user_commits import export_user_commits
+        success = export_user_commits(meta['user_id'], meta['outputs'], meta['since'], meta['until'], resume=True)
+    else:
+        from user_commits import (export_user_commits_direct_to_json, export_user_commits_direct_to_csv,
+                                  generate_user_legal_report_direct)
+        exporters = {
+            "json": export_user_commits_direct_to_json,
+            "csv": export_user_commits_direct_to_csv,
+            "html": generate_user_legal_report_direct
+        }
+        format_type, output_file = next(iter(meta['outputs'].items()))
+        success = exporters[format_type](meta['user_id'], output_file, meta['since'], meta['until'], resume=True)
+    
+    if success:
+        print("\n用户提交记录导出完成！")
+    else:
+        print("\n用户提交记录导出失败")
+    return success
+
+def restore_project_snapshot(project_id, snapshot_id=None):
+    """从去重存储还原项目的导出归档到输出目录"""
+    from archive_store import list_snapshots, restore_snapshot
+    
+    snapshots = list_snapshots(project_id)
+    if not snapshots:
+        print(f"去重存储中没有项目 {project_id} 的快照")
+        return False
+    if snapshot_id is None:
+        snapshot_id = snapshots[-1]
+    elif snapshot_id not in snapshots:
+        print(f"快照 {snapshot_id} 不存在，可用快照: {', '.join(snapshots)}")
+        return False
     
-    # 导出完成后删除项目列表文件
+    ensure_output_dir()
+    output_file = os.path.join(OUTPUT_DIR, f"{project_id}_{snapshot_id}.tar.gz")
     try:
-        from config import GITLAB_URL
-        domain = GITLAB_URL.split('://')[1].rstrip('/').replace(':', '_')
-        filename = f"{domain}.yaml"
-        filepath = os.path.join("projects", filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        restore_snapshot(project_id, snapshot_id, output_file)
     except Exception as e:
-        print(f"删除项目列表文件时出错: {str(e)}")
+        print(f"还原快照时出错: {str(e)}")
+        return False
+    print(f"快照 {snapshot_id} 已还原到: {output_file}")
+    return True
+
+def restore_repository_backup(project_id):
+    """按顺序应用仓库备份的 bundle，在输出目录中还原出裸仓库"""
+    from mirror_backup import load_index, restore_repository
     
-    return success
+    index = load_index(project_id)
+    if not index['bundles']:
+        print(f"没有项目 {project_id} 的仓库备份")
+        return False
+    
+    ensure_output_dir()
+    target = os.path.join(OUTPUT_DIR, f"{project_id}_{index['bundles'][-1]['id']}.git")
+    if os.path.exists(target):
+        print(f"目标目录已存在: {target}")
+        return False
+    try:
+        restore_repository(project_id, target)
+    except Exception as e:
+        print(f"还原仓库时出错: {str(e)}")
+        return False
+    print(f"仓库已还原到: {target}（可用 git clone {target} 检出）")
+    return True
+
+def verify_backups(directory=OUTPUT_DIR):
+    """并行校验备份目录中的所有导出归档"""
+    from archive_verify import verify_directory
+    
+    print(f"\n正在校验 {directory} 中的导出归档...")
+    results = verify_directory(directory)
+    if not results:
+        print("没有找到导出归档")
+        return True
+    
+    failed = [result for result in results if not result['ok']]
+    for result in results:
+        name = os.path.basename(result['file'])
+        if result['ok']:
+            note = "" if result['sidecar'] else "（无校验和文件）"
+            print(f"  [正常] {name}  {result['members']} 个成员{note}")
+        else:
+            print(f"  [损坏] {name}  {result['error']}")
+    print(f"校验完成：共 {len(results)} 个归档，正常 {len(results) - len(failed)} 个，损坏 {len(failed)} 个")
+    return not failed
 
 def show_users_list():
     """显示用户列表供选择"""
@@ -198,7 +385,6 @@ def handle_user_commits_export():
         if not success:
             print("无法获取项目列表，请先使用功能1查询项目列表")
             return
-        save_projects_to_file(projects)
     
     # 选择用户
     user_id = show_users_list()
@@ -210,34 +396,20 @@ def handle_user_commits_export():
     print("1. JSON格式（完整数据）")
     print("2. CSV格式（表格数据）")
     print("3. HTML报告（法律用途）")
+    print("4. 全部格式（一次抓取同时生成以上三种）")
+    print("5. NDJSON格式（逐行JSON，适合超大导出）")
     
-    format_choice = input("\n请选择格式 (1-3): ")
+    format_choice = input("\n请选择格式 (1-5): ")
     
     # 时间范围选择（可选）
-    print("\n时间范围设置（可选，直接回车跳过）：")
-    since = input("开始时间 (YYYY-MM-DD): ").strip()
-    until = input("结束时间 (YYYY-MM-DD): ").strip()
-    
-    # 验证时间格式
-    if since:
-        try:
-            datetime.strptime(since, '%Y-%m-%d')
-            since = since + "T00:00:00Z"
-        except ValueError:
-            print("开始时间格式错误，将忽略")
-            since = None
-    
-    if until:
-        try:
-            datetime.strptime(until, '%Y-%m-%d')
-            until = until + "T23:59:59Z"
-        except ValueError:
-            print("结束时间格式错误，将忽略")
-            until = None
+    since, until = ask_time_range()
     
     # 生成文件名
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
+    format_sets = {"1": ["json"], "2": ["csv"], "3": ["html"], "4": ["json", "csv", "html"], "5": ["ndjson"]}
+    resume = format_choice in format_sets and ask_resume("user_commits", user_id, since, until, format_sets[format_choice])
+    
     try:
         if format_choice == "1":
             # JSON格式
@@ -245,7 +417,7 @@ def handle_user_commits_export():
             filepath = os.path.join(OUTPUT_DIR, filename)
             
             from user_commits import export_user_commits_to_json
-            success = export_user_commits_to_json(user_id, filepath, since, until)
+            success = export_user_commits_to_json(user_id, filepath, since, until, resume)
             
         elif format_choice == "2":
             # CSV格式
@@ -253,7 +425,7 @@ def handle_user_commits_export():
             filepath = os.path.join(OUTPUT_DIR, filename)
             
             from user_commits import export_user_commits_to_csv
-            success = export_user_commits_to_csv(user_id, filepath, since, until)
+            success = export_user_commits_to_csv(user_id, filepath, since, until, resume)
             
         elif format_choice == "3":
             # HTML报告
@@ -261,7 +433,27 @@ def handle_user_commits_export():
             filepath = os.path.join(OUTPUT_DIR, filename)
             
             from user_commits import generate_legal_report
-            success = generate_legal_report(user_id, filepath, since, until)
+            success = generate_legal_report(user_id, filepath, since, until, resume)
+            
+        elif format_choice == "4":
+            # 全部格式，只抓取一次
+            outputs = {
+                "json": os.path.join(OUTPUT_DIR, f"user_{user_id}_commits_{timestamp}.json"),
+                "csv": os.path.join(OUTPUT_DIR, f"user_{user_id}_commits_{timestamp}.csv"),
+                "html": os.path.join(OUTPUT_DIR, f"user_{user_id}_legal_report_{timestamp}.html")
+            }
+            filepath = ", ".join(outputs.values())
+            
+            from user_commits import export_user_commits
+            success = export_user_commits(user_id, outputs, since, until, resume)
+            
+        elif format_choice == "5":
+            # NDJSON格式
+            filename = f"user_{user_id}_commits_{timestamp}.ndjson"
+            filepath = os.path.join(OUTPUT_DIR, filename)
+            
+            from user_commits import export_user_commits
+            success = export_user_commits(user_id, {"ndjson": filepath}, since, until, resume)
             
         else:
             print("无效的格式选择")
@@ -289,7 +481,6 @@ def handle_quick_export_user_by_id():
         if not success:
             print("无法获取项目列表，请先使用功能1查询项目列表")
             return
-        save_projects_to_file(projects)
     
     # 输入用户ID
     while True:
@@ -326,34 +517,17 @@ def handle_quick_export_user_by_id():
         format_choice = "3"
     
     # 时间范围选择（可选）
-    print("\n时间范围设置（可选，直接回车跳过）：")
-    since = input("开始时间 (YYYY-MM-DD): ").strip()
-    until = input("结束时间 (YYYY-MM-DD): ").strip()
-    
-    # 验证时间格式
-    if since:
-        try:
-            datetime.strptime(since, '%Y-%m-%d')
-            since = since + "T00:00:00Z"
-        except ValueError:
-            print("开始时间格式错误，将忽略")
-            since = None
-    
-    if until:
-        try:
-            datetime.strptime(until, '%Y-%m-%d')
-            until = until + "T23:59:59Z"
-        except ValueError:
-            print("结束时间格式错误，将忽略")
-            until = None
+    since, until = ask_time_range()
     
     # 确定导出格式
     format_map = {"1": "json", "2": "csv", "3": "html"}
     format_type = format_map.get(format_choice, "html")
     
+    resume = ask_resume("user_commits_direct", user_id, since, until, [format_type])
+    
     try:
         from user_commits import quick_export_user_by_id
-        success = quick_export_user_by_id(user_id, format_type, since, until)
+        success = quick_export_user_by_id(user_id, format_type, since, until, resume)
         
         if success:
             print(f"\n用户 {user_info['name']} 的提交记录导出完成！")
@@ -363,6 +537,61 @@ def handle_quick_export_user_by_id():
     except Exception as e:
         print(f"导出过程中出错: {str(e)}")
 
+def handle_team_audit():
+    """处理多用户团队提交审计"""
+    ensure_output_dir()
+    
+    # 检查项目列表文件是否存在
+    data = load_projects_file()
+    if not data:
+        print("\n正在自动获取项目列表...")
+        from gitlab_api import get_projects
+        projects, success = get_projects(save_automatically=True)
+        if not success:
+            print("无法获取项目列表，请先使用功能1查询项目列表")
+            return
+    
+    # 输入用户ID列表
+    while True:
+        user_input = input("\n请输入用户ID，多个用逗号分隔 (输入0返回): ").strip()
+        if user_input == '0':
+            return
+        try:
+            user_ids = list(dict.fromkeys(int(part) for part in user_input.replace('，', ',').split(',') if part.strip()))
+        except ValueError:
+            print("请输入有效的用户ID（数字，用逗号分隔）")
+            continue
+        if not user_ids or any(user_id <= 0 for user_id in user_ids):
+            print("用户ID必须是正整数，请重新输入")
+            continue
+        break
+    
+    # 选择导出格式
+    print("\n请选择导出格式：")
+    print("1. JSON格式（完整数据）")
+    print("2. CSV格式（表格数据）")  
+    print("3. HTML报告（法律用途）[推荐]")
+    print("4. 全部格式（一次抓取同时生成以上三种）")
+    
+    format_choice = input("\n请选择格式 (1-4，默认3): ").strip()
+    format_map = {"1": ["json"], "2": ["csv"], "3": ["html"], "4": ["json", "csv", "html"]}
+    format_types = format_map.get(format_choice, ["html"])
+    
+    # 时间范围选择（可选）
+    since, until = ask_time_range()
+    
+    try:
+        from team_audit import export_team_commits
+        counts = export_team_commits(user_ids, format_types, since or None, until or None)
+        
+        if counts is not None:
+            print(f"\n团队提交审计完成（{len(counts)} 个用户）！")
+        else:
+            print("\n团队提交审计失败")
+            
+    except Exception as e:
+        print(f"导出过程中出错: {str(e)}")
+
 def handle_quick_export_current_user():
     """处理当前用户快速导出"""
     ensure_output_dir()
@@ -376,42 +605,23 @@ def handle_quick_export_current_user():
         if not success:
             print("无法获取项目列表，请先使用功能1查询项目列表")
             return
-        save_projects_to_file(projects)
     
     # 选择导出格式
     print("\n请选择导出格式：")
     print("1. JSON格式（完整数据）")
     print("2. CSV格式（表格数据）")  
     print("3. HTML报告（法律用途）[推荐]")
+    print("4. 全部格式（一次抓取同时生成以上三种）")
     
-    format_choice = input("\n请选择格式 (1-3，默认3): ").strip()
+    format_choice = input("\n请选择格式 (1-4，默认3): ").strip()
     if not format_choice:
         format_choice = "3"
     
     # 时间范围选择（可选）
-    print("\n时间范围设置（可选，直接回车跳过）：")
-    since = input("开始时间 (YYYY-MM-DD): ").strip()
-    until = input("结束时间 (YYYY-MM-DD): ").strip()
-    
-    # 验证时间格式
-    if since:
-        try:
-            datetime.strptime(since, '%Y-%m-%d')
-            since = since + "T00:00:00Z"
-        except ValueError:
-            print("开始时间格式错误，将忽略")
-            since = None
-    
-    if until:
-        try:
-            datetime.strptime(until, '%Y-%m-%d')
-            until = until + "T23:59:59Z"
-        except ValueError:
-            print("结束时间格式错误，将忽略")
-            until = None
+    since, until = ask_time_range()
     
     # 确定导出格式
-    format_map = {"1": "json", "2": "csv", "3": "html"}
+    format_map = {"1": "json", "2": "csv", "3": "html", "4": "all"}
     format_type = format_map.get(format_choice, "html")
     
     try:
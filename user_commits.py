@@ -11,22 +11,26 @@
 @Description: 导出指定用户的提交记录，用于法律材料
 """
 
-import requests
-import json
-import csv
 import os
+from collections import deque
+from contextlib import closing
 from datetime import datetime
+from itertools import groupby
 from pathlib import Path
-from config import GITLAB_URL, PRIVATE_TOKEN, OUTPUT_DIR
+from concurrent.futures import ThreadPoolExecutor
+from config import OUTPUT_DIR, ASYNC_ENABLED, MIRROR_ENABLED, FETCH_CONCURRENCY
 from file_operations import load_projects_file
+from gitlab_client import get_client
+from commit_writers import COMMIT_FIELDS
+import memo
 
 def get_user_info(user_id):
-    """获取用户基本信息"""
-    url = f"{GITLAB_URL}/api/v4/users/{user_id}"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
+    """获取用户基本信息（进程内缓存，并发的相同查询只请求一次）"""
+    return memo.users.get_or_load(user_id, lambda: _fetch_user_info(user_id))
+
+def _fetch_user_info(user_id):
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client().get_user_info(user_id)
         if response.status_code == 200:
             return response.json()
         else:
@@ -37,12 +41,12 @@ def get_user_info(user_id):
         return None
 
 def get_current_user():
-    """获取当前认证用户信息"""
-    url = f"{GITLAB_URL}/api/v4/user"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
+    """获取当前认证用户信息（进程内缓存）"""
+    return memo.current_user.get_or_load('current', _fetch_current_user)
+
+def _fetch_current_user():
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client().get_current_user()
         if response.status_code == 200:
             return response.json()
         else:
@@ -54,31 +58,26 @@ def get_current_user():
 
 def get_all_users():
     """获取所有用户列表"""
-    url = f"{GITLAB_URL}/api/v4/users"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
     params = {"per_page": 100}
     
     try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"获取用户列表失败: {response.text}")
-            return None
+        return get_client().fetch_all_pages("/users", params=params)
     except Exception as e:
         print(f"获取用户列表时出错: {str(e)}")
         return None
 
-def get_project_commits(project_id, user_id=None, since=None, until=None):
-    """获取项目的提交记录"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
+def get_project_commits(project_id, user_id=None, since=None, until=None, author_email=None, with_stats=False):
+    """获取项目的提交记录（with_stats 为 True 时每个提交附带 stats）"""
     params = {
         "per_page": 100,
         "all": "true"
     }
+    if with_stats:
+        params["with_stats"] = "true"
     
-    if user_id:
+    if author_email:
+        params["author_email"] = author_email
+    elif user_id:
         # 先获取用户信息来获取邮箱
         user_info = get_user_info(user_id)
         if user_info and user_info.get('email'):
@@ -90,82 +89,62 @@ def get_project_commits(project_id, user_id=None, since=None, until=None):
         params["until"] = until
     
     all_commits = []
-    page = 1
     
     try:
-        while True:
-            params["page"] = page
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                commits = response.json()
-                if not commits:  # 没有更多提交
-                    break
-                all_commits.extend(commits)
-                page += 1
-                
-                # 避免无限循环，设置最大页数
-                if page > 100:
-                    break
-            else:
-                print(f"获取项目 {project_id} 提交记录失败: {response.text}")
-                break
-                
+        # 跟随分页响应头遍历所有提交，不设页数上限
+        for commit in get_client().paginate(f"/projects/{project_id}/repository/commits",
+                                            params=params, prefetch=True):
+            all_commits.append(commit)
     except Exception as e:
         print(f"获取提交记录时出错: {str(e)}")
     
     return all_commits
 
 def get_user_events(user_id, since=None, until=None):
-    """获取用户的所有活动事件"""
-    url = f"{GITLAB_URL}/api/v4/users/{user_id}/events"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    params = {
-        "per_page": 100
-        # 不限制action类型，获取所有事件
-    }
+    """获取用户的推送事件
     
-    if since:
-        params["after"] = since
-    if until:
-        params["before"] = until
+    只请求 action=pushed 的事件，并保存在本地事件库中：已覆盖请求时间范围时，
+    只获取游标（上次同步到的最新事件）之后的新事件，再从本地按时间范围筛选。
+    """
+    from event_store import get_event_store, day_before, filter_events
     
-    all_events = []
-    page = 1
+    store = get_event_store()
+    cursor = store.covers(user_id, since)
+    params = {
+        "per_page": 100,
+        "action": "pushed"
+    }
+    if cursor and cursor['last_created_at']:
+        params["after"] = day_before(cursor['last_created_at'])
+    elif since:
+        # after 按日期过滤且不含当天
+        params["after"] = day_before(since)
     
+    new_events = []
     try:
-        while True:
-            params["page"] = page
-            response = requests.get(url, headers=headers, params=params)
-            
-            if response.status_code == 200:
-                events = response.json()
-                if not events:  # 没有更多事件
-                    break
-                # 过滤出推送相关的事件
-                push_events = [e for e in events if e.get('action_name') in ['pushed to', 'pushed new']]
-                all_events.extend(push_events)
-                page += 1
-                
-                # 限制页数以提高速度
-                if page > 20:
-                    break
-            else:
-                print(f"获取用户事件失败: {response.text}")
+        # 事件按 id 从新到旧返回，遇到已保存的事件即可停止
+        for event in get_client().paginate(f"/users/{user_id}/events", params=params, prefetch=True):
+            if cursor and cursor['last_event_id'] and event['id'] <= cursor['last_event_id']:
                 break
-                
+            if event.get('action_name') in ['pushed to', 'pushed new']:
+                new_events.append(event)
     except Exception as e:
         print(f"获取用户事件时出错: {str(e)}")
+        # 获取不完整时不保存（避免游标越过缺失的事件），直接返回本次结果
+        return filter_events(new_events, since, until) + (store.events(user_id, since, until) if cursor else [])
     
-    return all_events
+    store.save(user_id, new_events, covered_from=None if cursor else (since or ''))
+    if cursor:
+        print(f"本地已有用户 {user_id} 的推送事件，新获取 {len(new_events)} 个")
+    return store.events(user_id, since, until)
 
 def get_project_details(project_id):
-    """获取项目的详细信息"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
+    """获取项目的详细信息（进程内缓存，并发的相同查询只请求一次）"""
+    return memo.projects.get_or_load(project_id, lambda: _fetch_project_details(project_id))
+
+def _fetch_project_details(project_id):
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client().get_project_details(project_id)
         if response.status_code == 200:
             return response.json()
         else:
@@ -175,40 +154,121 @@ def get_project_details(project_id):
         print(f"获取项目详情时出错: {str(e)}")
         return None
 
-def get_commits_in_range(project_id, commit_from, commit_to, user_email=None, max_commits=10):
-    """获取指定范围内的提交"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    params = {
-        "per_page": max_commits,
-        "since": commit_from,
-        "until": commit_to
+def build_project_info(project_detail):
+    """从项目详情中提取导出所需的项目信息"""
+    return {
+        'id': project_detail['id'],
+        'name': project_detail['name'],
+        'path': project_detail['path'],
+        'path_with_namespace': project_detail['path_with_namespace'],
+        'namespace': project_detail.get('namespace', {}).get('name', 'Unknown'),
+        'namespace_path': project_detail.get('namespace', {}).get('path', 'Unknown'),
+        'description': project_detail.get('description', '无描述'),
+        'visibility': project_detail.get('visibility', 'Unknown'),
+        'web_url': project_detail.get('web_url', ''),
+        'created_at': project_detail.get('created_at', '未知'),
+        'last_activity_at': project_detail.get('last_activity_at', '未知'),
+        'default_branch': project_detail.get('default_branch', 'main'),
+        'commit_count': project_detail.get('statistics', {}).get('commit_count', '未知'),
+        'repository_size': project_detail.get('statistics', {}).get('repository_size', '未知')
     }
-    
-    commits = []
+
+def list_push_commits(project_id, commit_from, commit_to):
+    """通过比较接口一次获取推送范围 (commit_from, commit_to] 内的全部提交（不含 stats）
+
+    commit_from 为空或全零（新建分支）时无法确定范围，返回 None。
+    """
+    if not commit_from or not commit_from.strip('0') or not commit_to:
+        return None
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = get_client().compare(project_id, commit_from, commit_to)
         if response.status_code == 200:
-            all_commits = response.json()
-            for commit in all_commits:
-                # 如果有邮箱信息，验证提交者
-                if user_email:
-                    if (commit.get('author_email') == user_email or 
-                        commit.get('committer_email') == user_email):
-                        commit_detail = get_commit_details(project_id, commit['id'])
-                        if commit_detail:
-                            commits.append(commit_detail)
-                else:
-                    # 没有邮箱信息，获取所有提交详情
-                    commit_detail = get_commit_details(project_id, commit['id'])
-                    if commit_detail:
-                        commits.append(commit_detail)
+            result = response.json()
+            if result.get('compare_timeout'):
+                print(f"  比较 {commit_from[:8]}..{commit_to[:8]} 超时，提交列表可能不完整")
+            return result.get('commits') or []
     except Exception as e:
-        print(f"获取提交范围时出错: {str(e)}")
+        print(f"获取推送范围时出错: {str(e)}")
+    return None
+
+def belongs_to_user(commit, user_email):
+    """判断提交是否属于该用户（没有邮箱信息时信任事件）"""
+    if not user_email:
+        return True
+    return commit.get('author_email') == user_email or commit.get('committer_email') == user_email
+
+def plan_user_commits_directly(user_info, since=None, until=None,
+                               concurrency=FETCH_CONCURRENCY if ASYNC_ENABLED else 1):
+    """基于用户推送事件确定要导出的提交（只获取项目信息和提交列表，不获取提交详情和差异）
+    
+    返回 (projects, listed)：projects 为 {项目ID: {'project_info': 项目, 'commits': [SHA, ...]}}，
+    按事件顺序排列、SHA 已去重；listed 为比较接口返回的 {(项目ID, SHA): 提交}。
+    多个提交的推送通过比较接口一次展开，无法展开时（单个提交、新建分支）只处理 commit_to。
+    涉及项目的详细信息和各次推送的提交范围由最多 concurrency 个线程并行获取。
+    """
+    user_email = user_info.get('email')
     
-    return commits
+    # 获取用户的推送事件
+    events = get_user_events(user_info['id'], since, until)
+    push_events = [event for event in events
+                   if event.get('action_name') in ['pushed to', 'pushed new'] and event.get('project_id')]
+    print(f"正在分析 {len(events)} 个用户活动事件...")
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        # 获取涉及项目的详细信息
+        project_ids = list(dict.fromkeys(event['project_id'] for event in push_events))
+        projects = {}
+        for project_id, project_detail in zip(project_ids, pool.map(get_project_details, project_ids)):
+            if project_detail:
+                projects[project_id] = {'project_info': build_project_info(project_detail), 'commits': []}
+                print(f"  发现项目: {project_detail['name']}")
+        
+        # 多个提交的推送通过比较接口一次展开为完整的提交范围，其余推送只处理 commit_to
+        pushes = []  # (project_id, commit_from, commit_to)
+        for event in push_events:
+            push_data = event.get('push_data', {})
+            commit_to = push_data.get('commit_to')
+            if event['project_id'] not in projects or not commit_to:
+                continue
+            commit_from = push_data.get('commit_from') if push_data.get('commit_count', 1) > 1 else None
+            pushes.append((event['project_id'], commit_from, commit_to))
+        range_results = pool.map(lambda push: list_push_commits(*push), pushes)
+        
+        listed = {}
+        for (project_id, _, commit_to), range_commits in zip(pushes, range_results):
+            if range_commits is None:
+                # 无法确定范围（单个提交、新建分支或请求失败）
+                projects[project_id]['commits'].append(commit_to)
+                continue
+            for commit in range_commits:
+                if belongs_to_user(commit, user_email):
+                    projects[project_id]['commits'].append(commit['id'])
+                    listed[(project_id, commit['id'])] = commit
+    
+    # 重叠的推送范围中同一个提交只处理一次
+    for project_data in projects.values():
+        project_data['commits'] = list(dict.fromkeys(project_data['commits']))
+    return projects, listed
 
-def get_user_commits_directly(user_id, since=None, until=None):
+def iter_user_commits_directly(user_info, plan, checkpoint=None, with_diff=False, fields=COMMIT_FIELDS):
+    """按项目产出计划中的提交 (project_info, commit_count, commits)
+    
+    commits 是惰性迭代器，调用方需在进入下一个项目前消费完；提交详情（以及 with_diff 时的文件变更）
+    由有界线程池跨项目并行获取，边获取边产出，内存占用不随提交数量增长。
+    只在 commit_to 上确定的提交获取详情后再次校验是否属于该用户。
+    """
+    projects, listed = plan
+    user_email = user_info.get('email')
+    targets = [(project_id, commit_sha) for project_id, project_data in projects.items()
+               for commit_sha in project_data['commits']]
+    with closing(_complete_commits(targets, listed, checkpoint, with_diff, fields)) as completed:
+        for project_id, group in groupby(completed, key=lambda item: item[0]):
+            project_data = projects[project_id]
+            commits = (commit_detail for _, commit_detail in group
+                       if commit_detail and belongs_to_user(commit_detail, user_email))
+            yield project_data['project_info'], len(project_data['commits']), commits
+
+def get_user_commits_directly(user_id, since=None, until=None, checkpoint=None, fields=COMMIT_FIELDS):
     """直接通过用户ID获取提交记录（基于用户活动事件）"""
     
     # 获取用户信息
@@ -219,79 +279,10 @@ def get_user_commits_directly(user_id, since=None, until=None):
     
     print(f"正在直接获取用户 {user_info['name']} ({user_info['username']}) 的提交记录...")
     
-    # 获取用户的推送事件
-    events = get_user_events(user_id, since, until)
-    
+    plan = plan_user_commits_directly(user_info, since, until)
     commits_by_project = {}
-    processed_commits = set()  # 避免重复处理同一个提交
-    
-    print(f"正在分析 {len(events)} 个用户活动事件...")
-    
-    for event in events:
-        if event.get('action_name') in ['pushed to', 'pushed new']:
-            project_id = event.get('project_id')
-            if not project_id:
-                continue
-                
-            # 获取项目详细信息（如果还没获取过）
-            if project_id not in commits_by_project:
-                print(f"正在获取项目 ID {project_id} 的详细信息...")
-                project_detail = get_project_details(project_id)
-                if not project_detail:
-                    continue
-                
-                # 增强项目信息
-                enhanced_project_info = {
-                    'id': project_detail['id'],
-                    'name': project_detail['name'],
-                    'path': project_detail['path'],
-                    'path_with_namespace': project_detail['path_with_namespace'],
-                    'namespace': project_detail.get('namespace', {}).get('name', 'Unknown'),
-                    'namespace_path': project_detail.get('namespace', {}).get('path', 'Unknown'),
-                    'description': project_detail.get('description', '无描述'),
-                    'visibility': project_detail.get('visibility', 'Unknown'),
-                    'web_url': project_detail.get('web_url', ''),
-                    'created_at': project_detail.get('created_at', '未知'),
-                    'last_activity_at': project_detail.get('last_activity_at', '未知'),
-                    'default_branch': project_detail.get('default_branch', 'main'),
-                    'commit_count': project_detail.get('statistics', {}).get('commit_count', '未知'),
-                    'repository_size': project_detail.get('statistics', {}).get('repository_size', '未知')
-                }
-                
-                commits_by_project[project_id] = {
-                    'project_info': enhanced_project_info,
-                    'commits': []
-                }
-                
-                print(f"  发现项目: {project_detail['name']}")
-            
-            # 从推送事件中提取提交信息
-            push_data = event.get('push_data', {})
-            commit_to = push_data.get('commit_to')
-            commit_count = push_data.get('commit_count', 1)
-            
-            # 处理主要提交（commit_to）
-            if commit_to and f"{project_id}:{commit_to}" not in processed_commits:
-                commit_detail = get_commit_details(project_id, commit_to)
-                if commit_detail:
-                    # 验证提交确实属于该用户
-                    if (commit_detail.get('author_email') == user_info.get('email') or 
-                        commit_detail.get('committer_email') == user_info.get('email') or
-                        not user_info.get('email')):  # 如果没有邮箱信息，信任事件
-                        commits_by_project[project_id]['commits'].append(commit_detail)
-                        processed_commits.add(f"{project_id}:{commit_to}")
-            
-            # 如果事件中有提交范围信息，尝试获取更多提交
-            if commit_count > 1:
-                commit_from = push_data.get('commit_from')
-                if commit_from and commit_to:
-                    # 获取范围内的提交（限制最多10个避免过多请求）
-                    range_commits = get_commits_in_range(project_id, commit_from, commit_to, user_info.get('email'), max_commits=10)
-                    for commit_detail in range_commits:
-                        commit_id = commit_detail['id']
-                        if f"{project_id}:{commit_id}" not in processed_commits:
-                            commits_by_project[project_id]['commits'].append(commit_detail)
-                            processed_commits.add(f"{project_id}:{commit_id}")
+    for project_info, _, commits in iter_user_commits_directly(user_info, plan, checkpoint, fields=fields):
+        commits_by_project[project_info['id']] = {'project_info': project_info, 'commits': list(commits)}
     
     # 统计结果
     total_commits = sum(len(data['commits']) for data in commits_by_project.values())
@@ -324,11 +315,10 @@ def get_user_commits_by_email(user_email, since=None, until=None):
         print(f"正在搜索项目: {project_name} (ID: {project_id})")
         
         # 使用邮箱搜索该项目的提交
-        url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits"
-        headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
         params = {
             "per_page": 100,
-            "author_email": user_email
+            "author_email": user_email,
+            "with_stats": "true"
         }
         
         if since:
@@ -337,21 +327,19 @@ def get_user_commits_by_email(user_email, since=None, until=None):
             params["until"] = until
         
         try:
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                commits = response.json()
-                if commits:
-                    commits_by_project[project_id] = {
-                        'project_info': project,
-                        'commits': []
-                    }
-                    
-                    for commit in commits:
-                        commit_detail = get_commit_details(project_id, commit['id'])
-                        if commit_detail:
-                            commits_by_project[project_id]['commits'].append(commit_detail)
-                    
-                    print(f"  找到 {len(commits)} 个提交")
+            commits = list(get_client().paginate(f"/projects/{project_id}/repository/commits", params=params))
+            if commits:
+                commits_by_project[project_id] = {
+                    'project_info': project,
+                    'commits': []
+                }
+                
+                for commit in commits:
+                    commit_detail = complete_commit(project_id, commit)
+                    if commit_detail:
+                        commits_by_project[project_id]['commits'].append(commit_detail)
+                
+                print(f"  找到 {len(commits)} 个提交")
             
         except Exception as e:
             print(f"搜索项目 {project_name} 时出错: {str(e)}")
@@ -378,11 +366,10 @@ def get_user_commits_by_email_enhanced(user_email, since=None, until=None):
         print(f"正在搜索项目: {project_name} (ID: {project_id})")
         
         # 使用邮箱搜索该项目的提交
-        url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits"
-        headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
         params = {
             "per_page": 100,
-            "author_email": user_email
+            "author_email": user_email,
+            "with_stats": "true"
         }
         
         if since:
@@ -391,44 +378,42 @@ def get_user_commits_by_email_enhanced(user_email, since=None, until=None):
             params["until"] = until
         
         try:
-            response = requests.get(url, headers=headers, params=params)
-            if response.status_code == 200:
-                commits = response.json()
-                if commits:
-                    # 获取项目详细信息
-                    project_detail = get_project_details(project_id)
-                    if project_detail:
-                        # 使用增强的项目信息
-                        enhanced_project_info = {
-                            'id': project_detail['id'],
-                            'name': project_detail['name'],
-                            'path': project_detail['path'],
-                            'path_with_namespace': project_detail['path_with_namespace'],
-                            'namespace': project_detail.get('namespace', {}).get('name', 'Unknown'),
-                            'namespace_path': project_detail.get('namespace', {}).get('path', 'Unknown'),
-                            'description': project_detail.get('description', '无描述'),
-                            'visibility': project_detail.get('visibility', 'Unknown'),
-                            'web_url': project_detail.get('web_url', ''),
-                            'created_at': project_detail.get('created_at', '未知'),
-                            'last_activity_at': project_detail.get('last_activity_at', '未知'),
-                            'default_branch': project_detail.get('default_branch', 'main'),
-                            'commit_count': project_detail.get('statistics', {}).get('commit_count', 0),
-                            'repository_size': project_detail.get('statistics', {}).get('repository_size', 0)
-                        }
-                    else:
-                        enhanced_project_info = project
-                    
-                    commits_by_project[project_id] = {
-                        'project_info': enhanced_project_info,
-                        'commits': []
+            commits = list(get_client().paginate(f"/projects/{project_id}/repository/commits", params=params))
+            if commits:
+                # 获取项目详细信息
+                project_detail = get_project_details(project_id)
+                if project_detail:
+                    # 使用增强的项目信息
+                    enhanced_project_info = {
+                        'id': project_detail['id'],
+                        'name': project_detail['name'],
+                        'path': project_detail['path'],
+                        'path_with_namespace': project_detail['path_with_namespace'],
+                        'namespace': project_detail.get('namespace', {}).get('name', 'Unknown'),
+                        'namespace_path': project_detail.get('namespace', {}).get('path', 'Unknown'),
+                        'description': project_detail.get('description', '无描述'),
+                        'visibility': project_detail.get('visibility', 'Unknown'),
+                        'web_url': project_detail.get('web_url', ''),
+                        'created_at': project_detail.get('created_at', '未知'),
+                        'last_activity_at': project_detail.get('last_activity_at', '未知'),
+                        'default_branch': project_detail.get('default_branch', 'main'),
+                        'commit_count': project_detail.get('statistics', {}).get('commit_count', 0),
+                        'repository_size': project_detail.get('statistics', {}).get('repository_size', 0)
                     }
-                    
-                    for commit in commits:
-                        commit_detail = get_commit_details(project_id, commit['id'])
-                        if commit_detail:
-                            commits_by_project[project_id]['commits'].append(commit_detail)
-                    
-                    print(f"  找到 {len(commits)} 个提交")
+                else:
+                    enhanced_project_info = project
+                
+                commits_by_project[project_id] = {
+                    'project_info': enhanced_project_info,
+                    'commits': []
+                }
+                
+                for commit in commits:
+                    commit_detail = complete_commit(project_id, commit)
+                    if commit_detail:
+                        commits_by_project[project_id]['commits'].append(commit_detail)
+                
+                print(f"  找到 {len(commits)} 个提交")
             
         except Exception as e:
             print(f"搜索项目 {project_name} 时出错: {str(e)}")
@@ -437,11 +422,8 @@ def get_user_commits_by_email_enhanced(user_email, since=None, until=None):
 
 def get_commit_details(project_id, commit_sha):
     """获取单个提交的详细信息"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits/{commit_sha}"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client().get_commit_details(project_id, commit_sha)
         if response.status_code == 200:
             return response.json()
         else:
@@ -450,13 +432,29 @@ def get_commit_details(project_id, commit_sha):
         print(f"获取提交详情时出错: {str(e)}")
         return None
 
+def fetch_commit_details(project_id, commit_sha, checkpoint=None):
+    """获取提交详情，优先使用检查点中已保存的结果"""
+    if checkpoint:
+        stored = checkpoint.stored_commit(project_id, commit_sha)
+        if stored:
+            return stored
+    commit_detail = get_commit_details(project_id, commit_sha)
+    if commit_detail and checkpoint:
+        checkpoint.record_commit(project_id, commit_detail)
+    return commit_detail
+
+def complete_commit(project_id, commit, fields=COMMIT_FIELDS, checkpoint=None):
+    """列表中的提交已包含所需字段时直接使用，缺少字段时才获取提交详情"""
+    if all(field in commit for field in fields):
+        if checkpoint:
+            checkpoint.record_commit(project_id, commit)
+        return commit
+    return fetch_commit_details(project_id, commit['id'], checkpoint)
+
 def get_commit_diff(project_id, commit_sha):
     """获取提交的文件变更信息"""
-    url = f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits/{commit_sha}/diff"
-    headers = {"PRIVATE-TOKEN": PRIVATE_TOKEN}
-    
     try:
-        response = requests.get(url, headers=headers)
+        response = get_client().get_commit_diff(project_id, commit_sha)
         if response.status_code == 200:
             return response.json()
         else:
@@ -465,81 +463,136 @@ def get_commit_diff(project_id, commit_sha):
         print(f"获取提交差异时出错: {str(e)}")
         return None
 
-def export_user_commits_to_json(user_id, output_file, since=None, until=None):
-    """将用户提交记录导出为JSON格式"""
-    
-    # 获取用户信息
-    user_info = get_user_info(user_id)
-    if not user_info:
-        print(f"无法获取用户 {user_id} 的信息")
-        return False
-    
-    # 获取项目列表
-    projects_data = load_projects_file()
-    if not projects_data:
-        print("无法加载项目列表")
-        return False
-    
-    export_data = {
-        "export_info": {
-            "export_time": datetime.now().isoformat(),
-            "gitlab_url": GITLAB_URL,
-            "export_type": "user_commits",
-            "user_id": user_id,
-            "time_range": {
-                "since": since,
-                "until": until
-            }
-        },
-        "user_info": user_info,
-        "projects": []
-    }
-    
-    print(f"正在导出用户 {user_info['name']} ({user_info['username']}) 的提交记录...")
+def iter_user_commits(user_info, projects, since=None, until=None, checkpoint=None, with_diff=True,
+                      fields=COMMIT_FIELDS):
+    """逐个项目抓取用户的提交记录
+    
+    依次产出 (project, commit_count, commits)，其中 commits 是惰性迭代器，
+    逐个补全提交（列表中缺少 fields 中的字段时获取提交详情，with_diff 为 True 时同时获取文件变更）；
+    调用方需在进入下一个项目前消费完。传入检查点时，已记录的提交列表和提交详情直接从检查点回放。
+    启用本地镜像时从镜像中查询提交，镜像同步失败的项目退回到 API。
+    """
+    user_email = user_info.get('email')
+    
+    if MIRROR_ENABLED:
+        from git_mirror import iter_mirrors, log_commits
+        mirrored = iter_mirrors(projects)
+    else:
+        mirrored = ((project, None) for project in projects)
     
-    for project in projects_data['projects']:
+    for project, mirror in mirrored:
         project_id = project['id']
-        project_name = project['name']
-        
-        print(f"正在处理项目: {project_name} (ID: {project_id})")
         
-        # 获取该项目中用户的提交
-        commits = get_project_commits(project_id, user_id, since, until)
+        if mirror:
+            print(f"正在处理项目: {project['name']} (ID: {project_id}) [本地镜像]")
+            commits = log_commits(mirror, project, user_email, since, until, with_diff)
+            if not commits:
+                print(f"  未找到提交记录")
+                continue
+            yield project, len(commits), iter(commits)
+            continue
         
-        if commits:
-            # 获取每个提交的详细信息
-            detailed_commits = []
-            for commit in commits:
-                commit_detail = get_commit_details(project_id, commit['id'])
-                if commit_detail:
-                    # 获取文件变更信息
-                    diff_info = get_commit_diff(project_id, commit['id'])
-                    commit_detail['file_changes'] = diff_info
-                    detailed_commits.append(commit_detail)
-            
-            project_data = {
-                "project_info": project,
-                "commits_count": len(detailed_commits),
-                "commits": detailed_commits
-            }
-            export_data['projects'].append(project_data)
-            print(f"  找到 {len(detailed_commits)} 个提交")
+        if checkpoint and project_id in checkpoint.projects_done:
+            print(f"正在处理项目: {project['name']} (ID: {project_id}) [检查点]")
         else:
+            print(f"正在处理项目: {project['name']} (ID: {project_id})")
+        
+        commit_ids = checkpoint.commit_lists.get(project_id) if checkpoint else None
+        listed = {}
+        if commit_ids is None:
+            # 获取该项目中用户的提交（邮箱只在开头查询一次）
+            commits = get_project_commits(project_id, since=since, until=until, author_email=user_email,
+                                          with_stats='stats' in fields)
+            listed = {commit['id']: commit for commit in commits}
+            commit_ids = list(listed)
+            if checkpoint:
+                checkpoint.record_commit_list(project_id, commit_ids)
+        
+        if not commit_ids:
             print(f"  未找到提交记录")
-    
-    # 保存到文件
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
+            continue
         
-        print(f"\n用户提交记录已导出到: {output_file}")
-        return True
-    except Exception as e:
-        print(f"保存文件时出错: {str(e)}")
-        return False
+        yield project, len(commit_ids), _iter_commit_details(project_id, commit_ids, checkpoint, with_diff,
+                                                             listed, fields)
 
-def export_user_commits_to_csv(user_id, output_file, since=None, until=None):
-    """将用户提交记录导出为CSV格式"""
+def complete_commit_detail(project_id, commit_sha, listed_commit=None, fields=COMMIT_FIELDS, with_diff=False,
+                           mirror=None):
+    """补全单个提交：列表中缺少 fields 中的字段时获取提交详情，with_diff 为 True 时附带文件变更
+
+    传入 mirror（本地镜像路径）时提交来自镜像，字段已齐全，差异也从镜像中读取。
+    """
+    if mirror:
+        if with_diff:
+            from git_mirror import attach_diffs
+            attach_diffs(mirror, listed_commit)
+        return listed_commit
+    commit_detail = listed_commit
+    if commit_detail is None or not all(field in commit_detail for field in fields):
+        commit_detail = get_commit_details(project_id, commit_sha)
+    if commit_detail and with_diff:
+        commit_detail['file_changes'] = get_commit_diff(project_id, commit_sha)
+    return commit_detail
+
+def _complete_commits(targets, listed=None, checkpoint=None, with_diff=True, fields=COMMIT_FIELDS,
+                      concurrency=FETCH_CONCURRENCY):
+    """按 targets [(项目ID, SHA)] 的顺序补全提交，产出 (项目ID, 提交详情或 None)
+
+    listed 为列表中已获取的 {(项目ID, SHA): 提交}，已包含 fields 中所有字段的提交不再请求提交详情。
+    需要请求的详情和差异由最多 concurrency 个线程并行获取，同时进行中的提交不超过 concurrency 的两倍，
+    内存占用不随提交数量增长；检查点中已有的提交直接回放，新获取的提交按顺序在当前线程中记录。
+    """
+    listed = listed or {}
+    stored = {target for target in targets if checkpoint and target in checkpoint.commit_offsets}
+    submitted = (target for target in targets if target not in stored)
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    pending = deque()
+    try:
+        for project_id, commit_sha in targets:
+            if (project_id, commit_sha) in stored:
+                yield project_id, checkpoint.stored_commit(project_id, commit_sha)
+                continue
+            while len(pending) < concurrency * 2:
+                target = next(submitted, None)
+                if target is None:
+                    break
+                pending.append(pool.submit(complete_commit_detail, *target, listed.get(target), fields, with_diff))
+            commit_detail = pending.popleft().result()
+            if commit_detail and checkpoint:
+                checkpoint.record_commit(project_id, commit_detail)
+            yield project_id, commit_detail
+    finally:
+        # 提前结束（出错或中断）时取消尚未开始的请求
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _iter_commit_details(project_id, commit_ids, checkpoint=None, with_diff=True, listed=None, fields=COMMIT_FIELDS):
+    """按 commit_ids 的顺序并行补全一个项目的提交，with_diff 为 True 时附带文件变更信息
+
+    listed 为提交列表中已获取的 {SHA: 提交}，已包含 fields 中所有字段的提交不再请求提交详情。
+    """
+    listed = {(project_id, commit_sha): commit for commit_sha, commit in (listed or {}).items()}
+    targets = [(project_id, commit_sha) for commit_sha in commit_ids]
+    with closing(_complete_commits(targets, listed, checkpoint, with_diff, fields)) as completed:
+        for _, commit_detail in completed:
+            if commit_detail:
+                yield commit_detail
+    
+    if checkpoint and project_id not in checkpoint.projects_done:
+        checkpoint.record_project_done(project_id)
+
+def export_user_commits(user_id, outputs, since=None, until=None, resume=False):
+    """抓取一次用户提交记录，同时流式输出多种格式
+    
+    outputs 为 {格式: 输出文件路径}，格式见 commit_writers.WRITERS。
+    提交边抓取边写入，内存占用不随提交数量增长。
+    进度记录在检查点中，resume 为 True 时从上次中断处继续（沿用原输出文件）。
+    """
+    from commit_writers import WRITERS, needs_diff, required_fields
+    from checkpoint import ExportCheckpoint
+    
+    unknown = [format_type for format_type in outputs if format_type not in WRITERS]
+    if unknown:
+        print(f"不支持的导出格式: {', '.join(unknown)}")
+        return False
     
     # 获取用户信息
     user_info = get_user_info(user_id)
@@ -553,215 +606,77 @@ def export_user_commits_to_csv(user_id, output_file, since=None, until=None):
         print("无法加载项目列表")
         return False
     
-    csv_data = []
+    info = {
+        "user_id": user_id,
+        "user_info": user_info,
+        "since": since,
+        "until": until,
+        "projects_scanned": len(projects_data['projects']),
+        "export_type": "user_commits"
+    }
     
     print(f"正在导出用户 {user_info['name']} ({user_info['username']}) 的提交记录...")
     
-    for project in projects_data['projects']:
-        project_id = project['id']
-        project_name = project['name']
-        
-        print(f"正在处理项目: {project_name} (ID: {project_id})")
-        
-        # 获取该项目中用户的提交
-        commits = get_project_commits(project_id, user_id, since, until)
-        
-        if commits:
-            for commit in commits:
-                commit_detail = get_commit_details(project_id, commit['id'])
-                if commit_detail:
-                    # 获取文件变更信息
-                    diff_info = get_commit_diff(project_id, commit['id'])
-                    
-                    # 统计文件变更
-                    files_changed = len(diff_info) if diff_info else 0
-                    additions = sum(d.get('additions', 0) for d in diff_info) if diff_info else 0
-                    deletions = sum(d.get('deletions', 0) for d in diff_info) if diff_info else 0
-                    
-                    csv_row = {
-                        'project_id': project_id,
-                        'project_name': project_name,
-                        'project_namespace': project['namespace'],
-                        'commit_id': commit_detail['id'],
-                        'commit_short_id': commit_detail['short_id'],
-                        'commit_title': commit_detail['title'],
-                        'commit_message': commit_detail['message'],
-                        'author_name': commit_detail['author_name'],
-                        'author_email': commit_detail['author_email'],
-                        'committer_name': commit_detail['committer_name'],
-                        'committer_email': commit_detail['committer_email'],
-                        'created_at': commit_detail['created_at'],
-                        'committed_date': commit_detail['committed_date'],
-                        'files_changed': files_changed,
-                        'additions': additions,
-                        'deletions': deletions,
-                        'web_url': commit_detail.get('web_url', '')
-                    }
-                    csv_data.append(csv_row)
-            
-            print(f"  找到 {len([c for c in commits])} 个提交")
+    checkpoint = ExportCheckpoint("user_commits", user_id, since, until, outputs, resume=resume)
+    outputs = checkpoint.outputs
+    if checkpoint.resumed:
+        print(f"从检查点继续导出（已完成 {len(checkpoint.projects_done)} 个项目）")
     
-    # 保存到CSV文件
+    success = True
+    completed = False
+    writers = []
     try:
-        with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
-            if csv_data:
-                writer = csv.DictWriter(f, fieldnames=csv_data[0].keys())
-                writer.writeheader()
-                writer.writerows(csv_data)
+        for format_type, output_file in outputs.items():
+            writers.append(WRITERS[format_type](output_file, info))
         
-        print(f"\n用户提交记录已导出到: {output_file}")
-        print(f"总共导出 {len(csv_data)} 个提交记录")
-        return True
+        # CSV/HTML 只需要提交详情中的 stats，内嵌文件变更的格式才下载差异
+        with_diff = needs_diff(outputs)
+        for project, commit_count, commits in iter_user_commits(user_info, projects_data['projects'], since, until,
+                                                                checkpoint, with_diff, required_fields(outputs)):
+            for writer in writers:
+                writer.begin_project(project, commit_count)
+            written = 0
+            for commit in commits:
+                for writer in writers:
+                    writer.write_commit(project, commit)
+                written += 1
+            for writer in writers:
+                writer.end_project(project, written)
+            print(f"  找到 {written} 个提交")
+        completed = True
     except Exception as e:
-        print(f"保存CSV文件时出错: {str(e)}")
-        return False
+        print(f"导出过程中出错: {str(e)}")
+        success = False
+    finally:
+        # 出错或中断时也写入结尾，保留已导出的部分
+        for writer in writers:
+            if not writer.close():
+                success = False
+        finish_checkpoint(checkpoint, completed and success)
+    
+    return success
+
+def finish_checkpoint(checkpoint, success):
+    """导出成功时删除检查点，否则保留并提示如何继续"""
+    if success:
+        checkpoint.finish()
+    else:
+        checkpoint.close()
+        print("导出未完成，进度已保存。可运行 python main.py --resume 继续")
+
+def export_user_commits_to_json(user_id, output_file, since=None, until=None, resume=False):
+    """将用户提交记录导出为JSON格式"""
+    return export_user_commits(user_id, {"json": output_file}, since, until, resume)
+
+def export_user_commits_to_csv(user_id, output_file, since=None, until=None, resume=False):
+    """将用户提交记录导出为CSV格式"""
+    return export_user_commits(user_id, {"csv": output_file}, since, until, resume)
 
-def generate_legal_report(user_id, output_file, since=None, until=None):
+def generate_legal_report(user_id, output_file, since=None, until=None, resume=False):
     """生成法律用途的HTML报告"""
-    
-    # 获取用户信息
-    user_info = get_user_info(user_id)
-    if not user_info:
-        print(f"无法获取用户 {user_id} 的信息")
-        return False
-    
-    # 获取项目列表
-    projects_data = load_projects_file()
-    if not projects_data:
-        print("无法加载项目列表")
-        return False
-    
-    html_content = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>用户提交记录法律报告 - {user_info['name']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.6; }}
-        .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; margin-bottom: 20px; }}
-        .user-info {{ margin: 20px 0; }}
-        .project {{ margin: 20px 0; border: 1px solid #ddd; padding: 15px; border-radius: 5px; }}
-        .project h3 {{ color: #2c3e50; margin-top: 0; }}
-        .project h4 {{ color: #34495e; margin-top: 20px; }}
-        .commit {{ margin: 10px 0; padding: 15px; background-color: #f9f9f9; border-radius: 3px; border-left: 4px solid #3498db; }}
-        .timestamp {{ color: #666; font-size: 0.9em; }}
-        .commit-id {{ font-family: monospace; font-size: 0.8em; background-color: #ecf0f1; padding: 2px 5px; border-radius: 3px; }}
-        table {{ width: 100%; border-collapse: collapse; margin: 10px 0; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; font-weight: bold; width: 200px; }}
-        .project-info th {{ background-color: #e8f4f8; }}
-        .commit-stats th {{ background-color: #e8f8f5; }}
-        .summary {{ background-color: #fef9e7; padding: 15px; border-radius: 5px; margin-top: 20px; }}
-        .footer {{ margin-top: 20px; padding-top: 20px; border-top: 1px solid #ddd; color: #666; font-size: 0.9em; }}
-        a {{ color: #3498db; text-decoration: none; }}
-        a:hover {{ text-decoration: underline; }}
-        pre {{ background-color: #f8f9fa; padding: 10px; border-radius: 3px; overflow-x: auto; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>用户提交记录法律报告</h1>
-        <p><strong>导出时间：</strong>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        <p><strong>数据来源：</strong>{GITLAB_URL}</p>
-        <p><strong>时间范围：</strong>{since or '所有时间'} 至 {until or '现在'}</p>
-    </div>
-    
-    <div class="user-info">
-        <h2>用户信息</h2>
-        <table>
-            <tr><th>用户ID</th><td>{user_info['id']}</td></tr>
-            <tr><th>用户名</th><td>{user_info['username']}</td></tr>
-            <tr><th>姓名</th><td>{user_info['name']}</td></tr>
-            <tr><th>邮箱</th><td>{user_info.get('email', '未提供')}</td></tr>
-            <tr><th>注册时间</th><td>{user_info.get('created_at', '未知')}</td></tr>
-            <tr><th>最后活动</th><td>{user_info.get('last_activity_on', '未知')}</td></tr>
-        </table>
-    </div>
-    
-    <div class="projects">
-        <h2>项目提交记录</h2>
-"""
-    
-    total_commits = 0
-    
-    for project in projects_data['projects']:
-        project_id = project['id']
-        project_name = project['name']
-        
-        print(f"正在处理项目: {project_name} (ID: {project_id})")
-        
-        # 获取该项目中用户的提交
-        commits = get_project_commits(project_id, user_id, since, until)
-        
-        if commits:
-            html_content += f"""
-        <div class="project">
-            <h3>{project_name} (ID: {project_id})</h3>
-            <p><strong>命名空间：</strong>{project['namespace']}</p>
-            <p><strong>提交数量：</strong>{len(commits)}</p>
-            
-            <div class="commits">
-"""
-            
-            for commit in commits:
-                commit_detail = get_commit_details(project_id, commit['id'])
-                if commit_detail:
-                    # 获取文件变更信息
-                    diff_info = get_commit_diff(project_id, commit['id'])
-                    files_changed = len(diff_info) if diff_info else 0
-                    
-                    html_content += f"""
-                <div class="commit">
-                    <h4>{commit_detail['title']}</h4>
-                    <p class="commit-id"><strong>提交ID：</strong>{commit_detail['id']}</p>
-                    <p class="timestamp"><strong>提交时间：</strong>{commit_detail['committed_date']}</p>
-                    <p><strong>作者：</strong>{commit_detail['author_name']} &lt;{commit_detail['author_email']}&gt;</p>
-                    <p><strong>提交者：</strong>{commit_detail['committer_name']} &lt;{commit_detail['committer_email']}&gt;</p>
-                    <p><strong>修改文件数：</strong>{files_changed}</p>
-                    <p><strong>提交消息：</strong></p>
-                    <pre>{commit_detail['message']}</pre>
-                </div>
-"""
-            
-            html_content += """
-            </div>
-        </div>
-"""
-            total_commits += len(commits)
-            print(f"  找到 {len(commits)} 个提交")
-    
-    html_content += f"""
-    </div>
-    
-    <div class="summary">
-        <h2>统计摘要</h2>
-        <p><strong>总提交数：</strong>{total_commits}</p>
-        <p><strong>涉及项目数：</strong>{len([p for p in projects_data['projects']])}</p>
-    </div>
-    
-    <div class="footer">
-        <p><em>此报告由 GitLab 项目导出工具生成，数据来源于 {GITLAB_URL}</em></p>
-        <p><em>报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</em></p>
-    </div>
-</body>
-</html>
-"""
-    
-    # 保存HTML文件
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        print(f"\n法律报告已生成: {output_file}")
-        print(f"总共包含 {total_commits} 个提交记录")
-        return True
-    except Exception as e:
-        print(f"生成HTML报告时出错: {str(e)}")
-        return False
+    return export_user_commits(user_id, {"html": output_file}, since, until, resume)
 
-def quick_export_current_user(format_type="html", since=None, until=None):
+def quick_export_current_user(format_type="html", since=None, until=None, resume=False):
     """快速导出当前用户的提交记录"""
     
     # 获取当前用户信息
@@ -784,20 +699,29 @@ def quick_export_current_user(format_type="html", since=None, until=None):
     if format_type == "json":
         filename = f"current_user_{username}_commits_{timestamp}.json"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return export_user_commits_to_json(user_id, filepath, since, until)
+        return export_user_commits_to_json(user_id, filepath, since, until, resume)
     elif format_type == "csv":
         filename = f"current_user_{username}_commits_{timestamp}.csv"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return export_user_commits_to_csv(user_id, filepath, since, until)
+        return export_user_commits_to_csv(user_id, filepath, since, until, resume)
     elif format_type == "html":
         filename = f"current_user_{username}_legal_report_{timestamp}.html"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return generate_legal_report(user_id, filepath, since, until)
+        return generate_legal_report(user_id, filepath, since, until, resume)
+    elif format_type == "all":
+        # 一次抓取同时输出三种格式
+        prefix = os.path.join(OUTPUT_DIR, f"current_user_{username}")
+        outputs = {
+            "json": f"{prefix}_commits_{timestamp}.json",
+            "csv": f"{prefix}_commits_{timestamp}.csv",
+            "html": f"{prefix}_legal_report_{timestamp}.html"
+        }
+        return export_user_commits(user_id, outputs, since, until, resume)
     else:
         print("不支持的导出格式")
         return False
 
-def quick_export_user_by_id(user_id, format_type="html", since=None, until=None):
+def quick_export_user_by_id(user_id, format_type="html", since=None, until=None, resume=False):
     """快速导出指定用户ID的提交记录"""
     
     # 获取用户信息
@@ -819,78 +743,62 @@ def quick_export_user_by_id(user_id, format_type="html", since=None, until=None)
     if format_type == "json":
         filename = f"user_{user_id}_{username}_commits_{timestamp}.json"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return export_user_commits_direct_to_json(user_id, filepath, since, until)
+        return export_user_commits_direct_to_json(user_id, filepath, since, until, resume)
     elif format_type == "csv":
         filename = f"user_{user_id}_{username}_commits_{timestamp}.csv"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return export_user_commits_direct_to_csv(user_id, filepath, since, until)
+        return export_user_commits_direct_to_csv(user_id, filepath, since, until, resume)
     elif format_type == "html":
         filename = f"user_{user_id}_{username}_legal_report_{timestamp}.html"
         filepath = os.path.join(OUTPUT_DIR, filename)
-        return generate_user_legal_report_direct(user_id, filepath, since, until)
+        return generate_user_legal_report_direct(user_id, filepath, since, until, resume)
     else:
         print("不支持的导出格式")
         return False
 
-def export_user_commits_direct_to_json(user_id, output_file, since=None, until=None):
-    """直接导出用户提交记录为JSON格式（高效版本）"""
-    
-    # 获取用户信息
-    user_info = get_user_info(user_id)
-    if not user_info:
-        print(f"无法获取用户 {user_id} 的信息")
-        return False
-    
-    # 直接获取用户的提交记录
-    commits_by_project = get_user_commits_directly(user_id, since, until)
-    
-    export_data = {
-        "export_info": {
-            "export_time": datetime.now().isoformat(),
-            "gitlab_url": GITLAB_URL,
-            "export_type": "user_commits_direct",
-            "user_id": user_id,
-            "time_range": {
-                "since": since,
-                "until": until
-            }
-        },
+def _write_commits_directly(writer_class, user_info, plan, output_file, since, until, checkpoint, with_diff, fields):
+    """将事件驱动获取的提交记录边获取边写入文件（每个项目结束时刷新，出错也保留已写入的部分）"""
+    info = {
+        "user_id": user_info['id'],
         "user_info": user_info,
-        "projects": []
+        "since": since,
+        "until": until,
+        "projects_scanned": len(plan[0]),
+        "export_type": "user_commits_direct"
     }
     
-    total_commits = 0
-    for project_id, project_data in commits_by_project.items():
-        # 获取每个提交的详细信息（包括文件变更）
-        detailed_commits = []
-        for commit in project_data['commits']:
-            # 获取文件变更信息
-            diff_info = get_commit_diff(project_id, commit['id'])
-            commit['file_changes'] = diff_info
-            detailed_commits.append(commit)
-        
-        project_export_data = {
-            "project_info": project_data['project_info'],
-            "commits_count": len(detailed_commits),
-            "commits": detailed_commits
-        }
-        export_data['projects'].append(project_export_data)
-        total_commits += len(detailed_commits)
-    
-    # 保存到文件
+    writer = None
+    success = True
+    projects_written = 0
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, ensure_ascii=False, indent=2)
-        
-        print(f"\n用户提交记录已导出到: {output_file}")
-        print(f"总共导出 {total_commits} 个提交记录，涉及 {len(commits_by_project)} 个项目")
-        return True
+        writer = writer_class(output_file, info)
+        for project_info, commit_count, commits in iter_user_commits_directly(user_info, plan, checkpoint,
+                                                                              with_diff, fields):
+            writer.begin_project(project_info, commit_count)
+            written = 0
+            for commit in commits:
+                writer.write_commit(project_info, commit)
+                written += 1
+            writer.end_project(project_info, written)
+            projects_written += 1
     except Exception as e:
         print(f"保存文件时出错: {str(e)}")
-        return False
+        success = False
+    finally:
+        if writer and not writer.close():
+            success = False
+    
+    if success:
+        print(f"涉及 {projects_written} 个项目")
+    return success
 
-def export_user_commits_direct_to_csv(user_id, output_file, since=None, until=None):
-    """直接导出用户提交记录为CSV格式（高效版本）"""
+def _export_directly(user_id, format_type, writer_class, output_file, since, until, resume):
+    """事件驱动导出的公共流程：确定要导出的提交，再用 writer_class 边获取边写入
+    
+    已获取的提交详情记录到检查点，继续导出时沿用原输出文件并直接复用。
+    """
+    from checkpoint import ExportCheckpoint
+    from commit_writers import needs_diff, required_fields
     
     # 获取用户信息
     user_info = get_user_info(user_id)
@@ -898,222 +806,35 @@ def export_user_commits_direct_to_csv(user_id, output_file, since=None, until=No
         print(f"无法获取用户 {user_id} 的信息")
         return False
     
-    # 直接获取用户的提交记录
-    commits_by_project = get_user_commits_directly(user_id, since, until)
-    
-    csv_data = []
+    print(f"正在直接获取用户 {user_info['name']} ({user_info['username']}) 的提交记录...")
     
-    for project_id, project_data in commits_by_project.items():
-        project_info = project_data['project_info']
-        
-        for commit in project_data['commits']:
-            # 获取文件变更信息
-            diff_info = get_commit_diff(project_id, commit['id'])
-            
-            # 统计文件变更
-            files_changed = len(diff_info) if diff_info else 0
-            additions = sum(d.get('additions', 0) for d in diff_info) if diff_info else 0
-            deletions = sum(d.get('deletions', 0) for d in diff_info) if diff_info else 0
-            
-            csv_row = {
-                'project_id': project_id,
-                'project_name': project_info['name'],
-                'project_path': project_info.get('path', project_info['name']),
-                'project_full_path': project_info.get('path_with_namespace', f"{project_info.get('namespace', 'Unknown')}/{project_info['name']}"),
-                'project_namespace': project_info.get('namespace', 'Unknown'),
-                'project_namespace_path': project_info.get('namespace_path', 'Unknown'),
-                'project_description': project_info.get('description', '无描述'),
-                'project_visibility': project_info.get('visibility', 'Unknown'),
-                'project_web_url': project_info.get('web_url', ''),
-                'project_created_at': project_info.get('created_at', '未知'),
-                'project_default_branch': project_info.get('default_branch', 'main'),
-                'project_total_commits': project_info.get('commit_count', 0),
-                'project_repository_size': project_info.get('repository_size', 0),
-                'commit_id': commit['id'],
-                'commit_short_id': commit['short_id'],
-                'commit_title': commit['title'],
-                'commit_message': commit['message'],
-                'author_name': commit['author_name'],
-                'author_email': commit['author_email'],
-                'committer_name': commit['committer_name'],
-                'committer_email': commit['committer_email'],
-                'created_at': commit['created_at'],
-                'committed_date': commit['committed_date'],
-                'files_changed': files_changed,
-                'additions': additions,
-                'deletions': deletions,
-                'commit_web_url': commit.get('web_url', '')
-            }
-            csv_data.append(csv_row)
+    checkpoint = ExportCheckpoint("user_commits_direct", user_id, since, until,
+                                  {format_type: output_file}, resume=resume)
+    if checkpoint.resumed:
+        print(f"从检查点继续导出（已获取 {len(checkpoint.commit_offsets)} 个提交）")
     
-    # 保存到CSV文件
+    success = False
     try:
-        with open(output_file, 'w', newline='', encoding='utf-8-sig') as f:
-            if csv_data:
-                writer = csv.DictWriter(f, fieldnames=csv_data[0].keys())
-                writer.writeheader()
-                writer.writerows(csv_data)
-        
-        print(f"\n用户提交记录已导出到: {output_file}")
-        print(f"总共导出 {len(csv_data)} 个提交记录，涉及 {len(commits_by_project)} 个项目")
-        return True
-    except Exception as e:
-        print(f"保存CSV文件时出错: {str(e)}")
-        return False
+        plan = plan_user_commits_directly(user_info, since, until)
+        print(f"需要导出 {len(plan[0])} 个项目中的 {sum(len(data['commits']) for data in plan[0].values())} 个提交")
+        success = _write_commits_directly(writer_class, user_info, plan, checkpoint.outputs[format_type],
+                                          since, until, checkpoint, needs_diff([format_type]),
+                                          required_fields([format_type]))
+    finally:
+        finish_checkpoint(checkpoint, success)
+    return success
+
+def export_user_commits_direct_to_json(user_id, output_file, since=None, until=None, resume=False):
+    """直接导出用户提交记录为JSON格式（高效版本）"""
+    from commit_writers import JsonWriter
+    return _export_directly(user_id, "json", JsonWriter, output_file, since, until, resume)
 
-def generate_user_legal_report_direct(user_id, output_file, since=None, until=None):
+def export_user_commits_direct_to_csv(user_id, output_file, since=None, until=None, resume=False):
+    """直接导出用户提交记录为CSV格式（高效版本）"""
+    from commit_writers import DirectCsvWriter
+    return _export_directly(user_id, "csv", DirectCsvWriter, output_file, since, until, resume)
+
+def generate_user_legal_report_direct(user_id, output_file, since=None, until=None, resume=False):
     """直接生成用户法律用途的HTML报告（高效版本）"""
-    
-    # 获取用户信息
-    user_info = get_user_info(user_id)
-    if not user_info:
-        print(f"无法获取用户 {user_id} 的信息")
-        return False
-    
-    # 直接获取用户的提交记录
-    commits_by_project = get_user_commits_directly(user_id, since, until)
-    
-    html_content = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>用户提交记录法律报告 - {user_info['name']}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; }}
-        .header {{ background-color: #f0f0f0; padding: 20px; border-radius: 5px; }}
-        .user-info {{ margin: 20px 0; }}
-        .project {{ margin: 20px 0; border: 1px solid #ddd; padding: 15px; }}
-        .commit {{ margin: 10px 0; padding: 10px; background-color: #f9f9f9; }}
-        .timestamp {{ color: #666; font-size: 0.9em; }}
-        .commit-id {{ font-family: monospace; font-size: 0.8em; }}
-        table {{ width: 100%; border-collapse: collapse; margin: 10px 0; }}
-        th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
-        th {{ background-color: #f2f2f2; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>用户提交记录法律报告</h1>
-        <p><strong>导出时间：</strong>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-        <p><strong>数据来源：</strong>{GITLAB_URL}</p>
-        <p><strong>时间范围：</strong>{since or '所有时间'} 至 {until or '现在'}</p>
-        <p><strong>导出方法：</strong>直接通过用户事件API获取</p>
-    </div>
-    
-    <div class="user-info">
-        <h2>用户信息</h2>
-        <table>
-            <tr><th>用户ID</th><td>{user_info['id']}</td></tr>
-            <tr><th>用户名</th><td>{user_info['username']}</td></tr>
-            <tr><th>姓名</th><td>{user_info['name']}</td></tr>
-            <tr><th>邮箱</th><td>{user_info.get('email', '未提供')}</td></tr>
-            <tr><th>注册时间</th><td>{user_info.get('created_at', '未知')}</td></tr>
-            <tr><th>最后活动</th><td>{user_info.get('last_activity_on', '未知')}</td></tr>
-        </table>
-    </div>
-    
-    <div class="projects">
-        <h2>项目提交记录</h2>
-"""
-    
-    total_commits = 0
-    
-    for project_id, project_data in commits_by_project.items():
-        project_info = project_data['project_info']
-        commits = project_data['commits']
-        
-        if commits:
-            # 计算文件变更统计
-            total_files_changed = 0
-            total_additions = 0
-            total_deletions = 0
-            
-            for commit in commits:
-                diff_info = get_commit_diff(project_id, commit['id'])
-                if diff_info:
-                    total_files_changed += len(diff_info)
-                    total_additions += sum(d.get('additions', 0) for d in diff_info)
-                    total_deletions += sum(d.get('deletions', 0) for d in diff_info)
-            
-            html_content += f"""
-        <div class="project">
-            <h3>{project_info['name']} (ID: {project_id})</h3>
-            <table class="project-info">
-                <tr><th>项目路径</th><td>{project_info.get('path_with_namespace', 'Unknown')}</td></tr>
-                <tr><th>命名空间</th><td>{project_info.get('namespace', 'Unknown')}</td></tr>
-                <tr><th>项目描述</th><td>{project_info.get('description', '无描述')}</td></tr>
-                <tr><th>可见性</th><td>{project_info.get('visibility', 'Unknown')}</td></tr>
-                <tr><th>默认分支</th><td>{project_info.get('default_branch', 'main')}</td></tr>
-                <tr><th>项目创建时间</th><td>{project_info.get('created_at', '未知')}</td></tr>
-                <tr><th>最后活动时间</th><td>{project_info.get('last_activity_at', '未知')}</td></tr>
-                <tr><th>项目总提交数</th><td>{project_info.get('commit_count', 0)}</td></tr>
-                <tr><th>仓库大小</th><td>{project_info.get('repository_size', 0)} 字节</td></tr>
-                <tr><th>项目链接</th><td><a href="{project_info.get('web_url', '')}" target="_blank">{project_info.get('web_url', '')}</a></td></tr>
-            </table>
-            
-            <h4>用户在此项目的提交统计</h4>
-            <table class="commit-stats">
-                <tr><th>用户提交数</th><td>{len(commits)}</td></tr>
-                <tr><th>总文件变更数</th><td>{total_files_changed}</td></tr>
-                <tr><th>总新增行数</th><td style="color: green;">+{total_additions}</td></tr>
-                <tr><th>总删除行数</th><td style="color: red;">-{total_deletions}</td></tr>
-                <tr><th>净变更行数</th><td style="color: {'green' if total_additions - total_deletions >= 0 else 'red'};">{'+' if total_additions - total_deletions >= 0 else ''}{total_additions - total_deletions}</td></tr>
-            </table>
-            
-            <div class="commits">
-"""
-            
-            for commit in commits:
-                # 获取文件变更信息
-                diff_info = get_commit_diff(project_id, commit['id'])
-                files_changed = len(diff_info) if diff_info else 0
-                
-                html_content += f"""
-                <div class="commit">
-                    <h4>{commit['title']}</h4>
-                    <p class="commit-id"><strong>提交ID：</strong>{commit['id']}</p>
-                    <p class="timestamp"><strong>提交时间：</strong>{commit['committed_date']}</p>
-                    <p><strong>作者：</strong>{commit['author_name']} &lt;{commit['author_email']}&gt;</p>
-                    <p><strong>提交者：</strong>{commit['committer_name']} &lt;{commit['committer_email']}&gt;</p>
-                    <p><strong>修改文件数：</strong>{files_changed}</p>
-                    <p><strong>提交消息：</strong></p>
-                    <pre>{commit['message']}</pre>
-                </div>
-"""
-            
-            html_content += """
-            </div>
-        </div>
-"""
-            total_commits += len(commits)
-    
-    html_content += f"""
-    </div>
-    
-    <div class="summary">
-        <h2>统计摘要</h2>
-        <p><strong>总提交数：</strong>{total_commits}</p>
-        <p><strong>涉及项目数：</strong>{len(commits_by_project)}</p>
-    </div>
-    
-    <div class="footer">
-        <p><em>此报告由 GitLab 项目导出工具生成，数据来源于 {GITLAB_URL}</em></p>
-        <p><em>报告生成时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</em></p>
-    </div>
-</body>
-</html>
-"""
-    
-    # 保存HTML文件
-    try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        print(f"\n法律报告已生成: {output_file}")
-        print(f"总共包含 {total_commits} 个提交记录，涉及 {len(commits_by_project)} 个项目")
-        return True
-    except Exception as e:
-        print(f"生成HTML报告时出错: {str(e)}")
-        return False
\ No newline at end of file
+    from commit_writers import DirectHtmlWriter
+    return _export_directly(user_id, "html", DirectHtmlWriter, output_file, since, until, resume)
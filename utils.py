@@ -1,5 +1,6 @@
 import signal
 import sys
+from datetime import datetime
 
 def setup_signal_handler():
     """设置信号处理"""
@@ -8,4 +9,29 @@ def setup_signal_handler():
         print("\n程序已中断")
         sys.exit(0)
     
-    signal.signal(signal.SIGINT, signal_handler) 
\ No newline at end of file
+    signal.signal(signal.SIGINT, signal_handler)
+
+def ask_time_range():
+    """交互输入时间范围，返回 (since, until)，格式错误的一端为 None，直接回车为空字符串"""
+    print("\n时间范围设置（可选，直接回车跳过）：")
+    since = input("开始时间 (YYYY-MM-DD): ").strip()
+    until = input("结束时间 (YYYY-MM-DD): ").strip()
+    
+    # 验证时间格式
+    if since:
+        try:
+            datetime.strptime(since, '%Y-%m-%d')
+            since = since + "T00:00:00Z"
+        except ValueError:
+            print("开始时间格式错误，将忽略")
+            since = None
+    
+    if until:
+        try:
+            datetime.strptime(until, '%Y-%m-%d')
+            until = until + "T23:59:59Z"
+        except ValueError:
+            print("结束时间格式错误，将忽略")
+            until = None
+    
+    return since, until